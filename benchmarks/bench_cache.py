@@ -0,0 +1,101 @@
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# Load time and cache hits of a page with a streamkit sized set of scripts,
+# served by a local stand-in, through the app's shared profile. Each start
+# is its own process sharing one cache directory, so the later starts show
+# what the disk cache saves.
+#
+#   python benchmarks/bench_cache.py [starts]
+import os
+import sys
+import json
+import time
+import tempfile
+import functools
+import subprocess
+import threading
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from common import application, wait, runJS
+
+ASSETS = 30
+ASSET_SIZE = 200 * 1024
+
+
+class CachingHandler(SimpleHTTPRequestHandler):
+
+    def end_headers(self):
+        self.send_header('Cache-Control', 'max-age=3600')
+        super().end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def writeAssets(directory):
+    scripts = []
+    for i in range(ASSETS):
+        name = 'asset%d.js' % (i)
+        with open(os.path.join(directory, name), 'w') as file:
+            file.write('window.asset%d = "%s";\n' % (i, 'x' * ASSET_SIZE))
+        scripts.append('<script src="%s"></script>' % (name))
+    with open(os.path.join(directory, 'index.html'), 'w') as file:
+        file.write('<!DOCTYPE html><html><body>%s</body></html>' % (''.join(scripts)))
+
+
+def child(url, cacheDir, configFile):
+    from PyQt5 import QtCore
+    from discord_overlay.config import ConfigStore
+    from discord_overlay.discord_overlay import App
+    overlayApp = App(application())
+    overlayApp.config = ConfigStore(configFile)
+    overlayApp.cacheDir = cacheDir
+    page = overlayApp.newPage()
+    start = time.monotonic()
+    page.load(QtCore.QUrl(url))
+    wait(page.loadFinished)
+    loaded = (time.monotonic() - start) * 1000
+    entries = runJS(page, "performance.getEntriesByType('resource').map(function(e) { return [e.transferSize, e.decodedBodySize]; })")
+    result = {
+        'load_ms': loaded,
+        'resources': len(entries),
+        'cached': len([entry for entry in entries if entry[0] == 0 and entry[1] > 0]),
+    }
+    page.deleteLater()
+    return result
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        print(json.dumps(child(*sys.argv[2:5])))
+        return
+    starts = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    results = {'assets': ASSETS, 'asset_kb': ASSET_SIZE // 1024, 'starts': []}
+    with tempfile.TemporaryDirectory() as directory:
+        assets = os.path.join(directory, 'assets')
+        os.makedirs(assets)
+        writeAssets(assets)
+        server = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(
+            CachingHandler, directory=assets))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = 'http://127.0.0.1:%d/index.html' % (server.server_address[1])
+        config = os.path.join(directory, 'discoverlay.ini')
+        for i in range(starts):
+            output = subprocess.check_output([
+                sys.executable, __file__, '--child', url, os.path.join(directory, 'cache'), config])
+            results['starts'].append(json.loads(output.decode('utf-8').strip().splitlines()[-1]))
+        server.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# CPU use of a voice overlay while nobody speaks, with a CSS animation and
+# a requestAnimationFrame loop running as streamkit's would, under each
+# render budget. Every budget is measured in its own process.
+#
+#   python benchmarks/bench_idle.py [seconds]
+import sys
+import json
+import subprocess
+from common import application, wait, runJS, FIXTURE_URL
+from PyQt5 import QtCore
+from PyQt5.QtWebEngineWidgets import QWebEngineView
+from discord_overlay import procstats
+from discord_overlay.discord_overlay import (
+    readAsset, buildTweakBundle, installTweakBundle, NO_ANIMATION_CSS)
+
+OPTIONS = {'css': '', 'title': True, 'mutedeaf': True, 'hideinactive': False,
+           'chatlimit': 0, 'maxfps': 0, 'idle': 0}
+BUDGETS = {
+    'unlimited': {},
+    'maxfps_10': {'maxfps': 10},
+    'no_animations': {'css': NO_ANIMATION_CSS},
+    'idle_after_1s': {'idle': 1},
+}
+ANIMATE = """
+var style = document.createElement('style');
+style.textContent = '@keyframes pulse { from { opacity: 1; } to { opacity: 0.3; } } .avatar { animation: pulse 0.5s infinite alternate; }';
+document.head.appendChild(style);
+(function tick() { document.body.dataset.tick = performance.now(); requestAnimationFrame(tick); })();
+fixture.populate(10);
+"""
+
+
+def run(budget, seconds):
+    application()
+    options = dict(OPTIONS, **BUDGETS[budget])
+    view = QWebEngineView()
+    installTweakBundle(view.page(), buildTweakBundle(options))
+    view.page().setHtml(readAsset('fixture-voice.html'), QtCore.QUrl(FIXTURE_URL))
+    wait(view.page().loadFinished)
+    runJS(view.page(), ANIMATE + "true;")
+    view.resize(300, 800)
+    view.show()
+
+    # Long enough to settle, and for the idle budget to have gone quiet
+    loop = QtCore.QEventLoop()
+    QtCore.QTimer.singleShot(3000, loop.quit)
+    loop.exec_()
+    before = procstats.tree()
+    QtCore.QTimer.singleShot(int(seconds * 1000), loop.quit)
+    loop.exec_()
+    after = procstats.tree()
+    return {
+        'cpu_percent': (after['cpu'] - before['cpu']) * 100 / seconds,
+        'frames': runJS(view.page(), "window.overlayFrames.stats()"),
+    }
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--budget':
+        print(json.dumps(run(sys.argv[2], float(sys.argv[3]))))
+        return
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    results = {'seconds': seconds}
+    for budget in BUDGETS:
+        output = subprocess.check_output(
+            [sys.executable, __file__, '--budget', budget, str(seconds)])
+        results[budget] = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# Voice event to frame latency of the tweaked voice overlay, with the
+# latency tracer on, replaying a recording through the local replay server
+# in real time. Without a recording a synthetic busy channel is used.
+#
+#   python benchmarks/bench_latency.py [recording.jsonl] [--seconds 20] [--maxfps 0]
+import os
+import json
+import argparse
+import tempfile
+from common import application, wait, runJS
+from PyQt5 import QtCore
+from PyQt5.QtWebEngineWidgets import QWebEngineView
+from discord_overlay.discord_overlay import buildTweakBundle, installTweakBundle
+from discord_overlay.metrics import percentiles
+from discord_overlay.replay import ReplayServer, syntheticRecording
+
+OPTIONS = {'css': '', 'title': True, 'mutedeaf': True, 'hideinactive': False,
+           'chatlimit': 0, 'maxfps': 0, 'idle': 0, 'trace': True}
+
+
+def measure(recording, seconds, maxfps):
+    application()
+    server = ReplayServer(recording).start()
+    view = QWebEngineView()
+    installTweakBundle(view.page(), buildTweakBundle(dict(OPTIONS, maxfps=maxfps)))
+    view.resize(300, 800)
+    view.show()
+    view.page().load(QtCore.QUrl(server.url(speed=1)))
+    wait(view.page().loadFinished)
+    loop = QtCore.QEventLoop()
+    QtCore.QTimer.singleShot(int(seconds * 1000), loop.quit)
+    loop.exec_()
+    samples = runJS(view.page(), "window.overlayTracer.drain()")
+    server.stop()
+    result = {'events': len(samples)}
+    for index, stage in ((1, 'mutation'), (2, 'frame')):
+        points = percentiles([sample[index] for sample in samples])
+        result[stage] = dict(('p%d' % (point * 100), ms) for point, ms in points.items())
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Voice event to frame latency")
+    parser.add_argument('recording', nargs='?', help="JSONL recording to replay")
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--maxfps', type=int, default=0)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        recording = args.recording
+        if not recording:
+            recording = os.path.join(directory, 'voice.jsonl')
+            syntheticRecording(recording, members=20, seconds=args.seconds)
+        results = measure(recording, args.seconds, args.maxfps)
+    results.update({'seconds': args.seconds, 'maxfps': args.maxfps})
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# Memory and CPU of one voice overlay drawn by the web view and by the
+# native renderer, both fed the same synthetic recording. Each renderer
+# runs in its own process so their figures don't mix.
+#
+#   python benchmarks/bench_renderer.py [members] [seconds]
+import os
+import sys
+import json
+import tempfile
+import subprocess
+from common import application, wait, FIXTURE_URL
+from PyQt5 import QtCore
+from PyQt5.QtWebEngineWidgets import QWebEngineView
+from discord_overlay import procstats
+from discord_overlay.discord_overlay import (
+    readAsset, buildTweakBundle, installTweakBundle)
+from discord_overlay.voicestate import VoiceState
+from discord_overlay.native import VoiceWidget, RecordedFeed
+from discord_overlay.replay import syntheticRecording
+
+OPTIONS = {'css': '', 'title': True, 'mutedeaf': True, 'hideinactive': False}
+
+
+def run(mode, recording, seconds):
+    application()
+    state = VoiceState()
+    feed = RecordedFeed(state, recording)
+    if mode == 'native':
+        widget = VoiceWidget(state)
+        widget.configure(['1'], False, True, True, False)
+    else:
+        widget = QWebEngineView()
+        installTweakBundle(widget.page(), buildTweakBundle(OPTIONS))
+        widget.page().setHtml(readAsset('fixture-voice.html'), QtCore.QUrl(FIXTURE_URL))
+        wait(widget.page().loadFinished)
+        feed.received.connect(lambda channel, payload: widget.page().runJavaScript(
+            "fixture.emit(%s)" % (json.dumps(payload))))
+    widget.resize(300, 800)
+    widget.show()
+
+    # Let startup settle before measuring
+    loop = QtCore.QEventLoop()
+    QtCore.QTimer.singleShot(2000, loop.quit)
+    loop.exec_()
+    before = procstats.tree()
+    feed.start()
+    QtCore.QTimer.singleShot(int(seconds * 1000), loop.quit)
+    loop.exec_()
+    after = procstats.tree()
+    return {
+        'processes': after['processes'],
+        'rss_mb': after['rss'] / 1048576,
+        'cpu_percent': (after['cpu'] - before['cpu']) * 100 / seconds,
+    }
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--mode':
+        print(json.dumps(run(sys.argv[2], sys.argv[3], float(sys.argv[4]))))
+        return
+    members = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+    with tempfile.TemporaryDirectory() as directory:
+        recording = os.path.join(directory, 'voice.jsonl')
+        syntheticRecording(recording, members=members, seconds=seconds)
+        results = {'members': members, 'seconds': seconds}
+        for mode in ('web', 'native'):
+            output = subprocess.check_output(
+                [sys.executable, __file__, '--mode', mode, recording, str(seconds)])
+            results[mode] = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
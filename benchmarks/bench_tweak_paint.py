@@ -0,0 +1,95 @@
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# Time from load start to the first frame painted with the overlay tweaks
+# in place, injecting them after loadFinished as before, and registering
+# them as a script bundle that runs at document creation.
+#
+#   python benchmarks/bench_tweak_paint.py [runs]
+import sys
+import json
+import statistics
+from common import application, wait, runJS, FIXTURE_URL
+from PyQt5 import QtCore
+from PyQt5.QtWebEngineWidgets import QWebEnginePage
+from discord_overlay.discord_overlay import (
+    readAsset, buildTweakBundle, installTweakBundle, RIGHT_ALIGN_CSS, CHAT_RESIZE_CSS)
+
+OPTIONS = {
+    'css': RIGHT_ALIGN_CSS + CHAT_RESIZE_CSS,
+    'title': True,
+    'mutedeaf': True,
+    'hideinactive': False,
+}
+
+# After loadFinished each tweak went over as its own runJavaScript call
+LEGACY_CSS = "(function() { css = document.getElementById('%s'); if (css == null) { css = document.createElement('style'); css.type='text/css'; css.id='%s'; document.head.appendChild(css); } css.innerText='%s';})()"
+STAMP = "requestAnimationFrame(function() { window.overlayStyledAt = performance.now(); });"
+
+
+def styledAt(page):
+    # runJavaScript can't wait on a promise, so poll for the stamp instead
+    for attempt in range(200):
+        value = runJS(page, "window.overlayStyledAt")
+        if value is not None:
+            return value
+        loop = QtCore.QEventLoop()
+        QtCore.QTimer.singleShot(5, loop.quit)
+        loop.exec_()
+    raise TimeoutError('page was never styled')
+
+
+def legacy():
+    page = QWebEnginePage()
+    page.setHtml(readAsset('fixture-voice.html'), QtCore.QUrl(FIXTURE_URL))
+    wait(page.loadFinished)
+    page.runJavaScript(readAsset('dispatcher.js'))
+    page.runJavaScript(LEGACY_CSS % ('cssrightalign', 'cssrightalign', RIGHT_ALIGN_CSS))
+    page.runJavaScript(LEGACY_CSS % ('cssflexybox', 'cssflexybox', CHAT_RESIZE_CSS))
+    page.runJavaScript(readAsset('mutedeaf.js'))
+    page.runJavaScript(STAMP)
+    result = styledAt(page)
+    page.deleteLater()
+    return result
+
+
+def bundled():
+    page = QWebEnginePage()
+    installTweakBundle(page, buildTweakBundle(OPTIONS))
+    page.setHtml(readAsset('fixture-voice.html'), QtCore.QUrl(FIXTURE_URL))
+    wait(page.loadFinished)
+    result = styledAt(page)
+    page.deleteLater()
+    return result
+
+
+def summarise(samples):
+    return {
+        'median_ms': statistics.median(samples),
+        'min_ms': min(samples),
+        'max_ms': max(samples),
+    }
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    application()
+    results = {
+        'runs': runs,
+        'legacy': summarise([legacy() for i in range(runs)]),
+        'bundled': summarise([bundled() for i in range(runs)]),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# Compares the cost of applying VOICE_STATE_UPDATE events with the old
+# span-scanning mute/deaf script and the indexed module.
+#
+#   python benchmarks/bench_voice_state.py [members] [events]
+import sys
+import json
+from common import loadFixture, runJS
+from discord_overlay.discord_overlay import readAsset
+
+CONSOLE_CATCHER = "if(typeof console.oldlog === 'undefined'){console.oldlog=console.log;}window.consoleCatchers=[];console.log = function(text,input){if(typeof input !== 'undefined'){window.consoleCatchers.forEach(function(item,index){item(input)})}else{console.oldlog(text);}};"
+
+LEGACY = "window.consoleCatchers.push(function(input){if(input.evt == 'VOICE_STATE_UPDATE'){name=input.data.nick;uState = input.data.voice_state;muteicon = '';if(uState.self_mute || uState.mute){muteicon='<img src=\\'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAABAAAAAQCAYAAAAf8/9hAAAABmJLR0QA/wD/AP+gvaeTAAAACXBIWXMAABhMAAAYJQE8CCw1AAAAB3RJTUUH5AUGCx0VMm5EjgAAABl0RVh0Q29tbWVudABDcmVhdGVkIHdpdGggR0lNUFeBDhcAAABzSURBVDjLxZIxCsAwCEW/oT1P7z93zZJjeIYMv0sCIaBoodTJDz6/JgJfBslOsns1xYONvK66JCeqAC4ALTz+dJvOo0lu/zS87p2C98IdHlq9Buo5D62h17amScMk78hBWXB/DUdP2fyBaINjJiJy4o94AM8J8ksz/MQjAAAAAElFTkSuQmCC\\' style=\\'height:0.9em;\\'>';}deaficon = '';if(uState.self_deaf || uState.deaf){deaficon='<img src=\\'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAABAAAAAQCAYAAAAf8/9hAAAABmJLR0QA/wD/AP+gvaeTAAAACXBIWXMAABhMAAAYJQE8CCw1AAAAB3RJTUUH5AUGCx077rhJQQAAABl0RVh0Q29tbWVudABDcmVhdGVkIHdpdGggR0lNUFeBDhcAAACNSURBVDjLtZPNCcAgDIUboSs4iXTGLuI2XjpBz87g4fWiENr8iNBAQPR9ef7EbfsjAEQAN4A2UtCcGtyMzFxjwVlyBHAwTRFh52gqHDVnF+6L1XJ/w31cp7YvOX/0xlOJ254qYJ1ZLTAmPWeuDVxARDurfBFR8jovMLEKWxG6c1qB55pEuQOpE8vKz30AhEdNuXK0IugAAAAASUVORK5CYII=\\' style=\\'height:0.9em;\\'>';}spans = document.getElementsByTagName('span');for(i=0;i<spans.length;i++){if(spans[i].innerHTML.startsWith(name)){text = name + muteicon + deaficon;spans[i].innerHTML = text;}}}});"
+
+UPDATES = """
+(function(members, events) {
+    var start = performance.now();
+    for (var i = 0; i < events; i++) {
+        var data = fixture.member(String(i %% members), 'User ' + (i %% members));
+        data.voice_state.self_mute = (i %% 2) == 0;
+        data.voice_state.self_deaf = (i %% 3) == 0;
+        console.log('update', {evt: 'VOICE_STATE_UPDATE', data: data});
+    }
+    return performance.now() - start;
+})(%d, %d)
+"""
+
+
+def measure(catcher, script, members, events):
+    page = loadFixture(readAsset('fixture-voice.html'))
+    runJS(page, "fixture.populate(%d)" % (members))
+    runJS(page, catcher)
+    runJS(page, script)
+    elapsed = runJS(page, UPDATES % (members, events))
+    return {'total_ms': elapsed, 'per_event_us': elapsed * 1000 / events}
+
+
+def main():
+    members = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    events = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    results = {
+        'members': members,
+        'events': events,
+        'legacy': measure(CONSOLE_CATCHER, LEGACY, members, events),
+        'indexed': measure(readAsset('dispatcher.js'), readAsset('mutedeaf.js'), members, events),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import os
+import sys
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+# Run against the checkout rather than an installed copy
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5 import QtCore, QtWidgets  # noqa: E402
+from PyQt5.QtWebEngineWidgets import QWebEnginePage  # noqa: E402
+
+FIXTURE_URL = 'http://localhost/fixture'
+
+_app = None
+
+
+def application():
+    global _app
+    if _app is None:
+        _app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    return _app
+
+
+def wait(signal, timeout=30000):
+    # Block on a Qt signal, returning its arguments
+    loop = QtCore.QEventLoop()
+    result = []
+
+    def done(*args):
+        result.extend(args)
+        loop.quit()
+    signal.connect(done)
+    QtCore.QTimer.singleShot(timeout, loop.quit)
+    loop.exec_()
+    signal.disconnect(done)
+    return result
+
+
+def runJS(page, js, timeout=30000):
+    loop = QtCore.QEventLoop()
+    result = []
+
+    def done(value):
+        result.append(value)
+        loop.quit()
+    page.runJavaScript(js, done)
+    QtCore.QTimer.singleShot(timeout, loop.quit)
+    loop.exec_()
+    if not result:
+        raise TimeoutError(js[:60])
+    return result[0]
+
+
+def loadFixture(html, page=None):
+    application()
+    if page is None:
+        page = QWebEnginePage()
+    page.setHtml(html, QtCore.QUrl(FIXTURE_URL))
+    wait(page.loadFinished)
+    return page
@@ -0,0 +1,163 @@
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# Startup and per-overlay cost of the real App and Overlay code, run
+# offscreen against the local replay server. Every overlay count is
+# measured in a fresh process with its own config directory.
+#
+#   python benchmarks/suite.py [--counts 1 10 50] [--output results.json]
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def writeConfig(directory, url, count):
+    os.makedirs(os.path.join(directory, 'discord-overlay'), exist_ok=True)
+    with open(os.path.join(directory, 'discord-overlay', 'discoverlay.ini'), 'w') as file:
+        for i in range(count):
+            file.write("[bench%d]\nurl = %s\nmultiplex = 0\n\n" % (
+                i, url.replace('/overlay/voice/1/1', '/overlay/voice/1/%d' % (i + 1))))
+
+
+def settle(milliseconds):
+    from PyQt5 import QtCore
+    loop = QtCore.QEventLoop()
+    QtCore.QTimer.singleShot(milliseconds, loop.quit)
+    loop.exec_()
+
+
+def measure(count, idleSeconds):
+    # Runs in the child process. XDG_CONFIG_HOME and XDG_CACHE_HOME have
+    # already been pointed at scratch directories, so this must import the
+    # app only now
+    from PyQt5 import QtWidgets, QtCore
+    from discord_overlay import procstats
+    from discord_overlay.discord_overlay import App
+
+    start = time.monotonic()
+    QtCore.QCoreApplication.setAttribute(QtCore.Qt.AA_ShareOpenGLContexts)
+    app = QtWidgets.QApplication(sys.argv)
+    overlayApp = App(app)
+    started = []
+    overlayApp.started.connect(lambda: started.append(time.monotonic()))
+    loaded = {}
+    styled = {}
+
+    # Overlays are created and loaded from a queue once main has returned
+    appLoaded = overlayApp.overlayLoaded
+
+    def overlayLoaded(overlay, timedOut=False):
+        if not timedOut:
+            loaded.setdefault(overlay, time.monotonic())
+        appLoaded(overlay, timedOut)
+    overlayApp.overlayLoaded = overlayLoaded
+    overlayApp.main()
+    mainReturned = time.monotonic()
+
+    def styledAt(overlay):
+        def done(value):
+            if value is not None:
+                styled.setdefault(overlay, time.monotonic())
+        return done
+
+    def pollStyled():
+        for overlay in list(loaded):
+            if overlay not in styled and overlay.webPage():
+                overlay.webPage().runJavaScript("window.overlayStyledAt", styledAt(overlay))
+    poll = QtCore.QTimer()
+    poll.timeout.connect(pollStyled)
+    poll.start(10)
+    deadline = time.monotonic() + 60 + count
+    while (not started or len(styled) < len(loaded)) and time.monotonic() < deadline:
+        app.processEvents(QtCore.QEventLoop.AllEvents, 50)
+    poll.stop()
+
+    settle(2000)
+    pid = os.getpid()
+    renderers = procstats.descendants(pid)
+    before = procstats.tree(pid)
+    settle(int(idleSeconds * 1000))
+    after = procstats.tree(pid)
+
+    def since(times):
+        return (max(times.values()) - start) * 1000 if times else None
+    return {
+        'overlays': len([overlay for overlay in overlayApp.overlays if overlay.overlay]),
+        'cold_start_ms': (mainReturned - start) * 1000,
+        'started_ms': (started[0] - start) * 1000 if started else None,
+        'phases_ms': dict(overlayApp.phases),
+        'load_finished_ms': since(loaded),
+        'tweaks_applied_ms': since(styled),
+        'loaded': len(loaded),
+        'styled': len(styled),
+        'main_rss_mb': (procstats.rss(pid) or 0) / 1048576,
+        'renderer_rss_mb': sum(procstats.rss(p) or 0 for p in renderers) / 1048576,
+        'processes': after['processes'],
+        'idle_cpu_percent': (after['cpu'] - before['cpu']) * 100 / idleSeconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Overlay startup benchmarks")
+    parser.add_argument('--counts', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--idle', type=float, default=5,
+                        help="seconds to measure idle CPU over")
+    parser.add_argument('--output', help="write the JSON results here")
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(measure(args.child, args.idle)))
+        return
+
+    from discord_overlay.replay import ReplayServer, syntheticRecording
+    results = {'timestamp': time.time(), 'runs': []}
+    with tempfile.TemporaryDirectory() as directory:
+        # An idle channel: members join but nobody speaks afterwards
+        recording = os.path.join(directory, 'idle.jsonl')
+        syntheticRecording(recording, members=10, seconds=0)
+        server = ReplayServer(recording).start()
+        for count in args.counts:
+            config = os.path.join(directory, 'config%d' % (count))
+            writeConfig(config, server.url(speed=0), count)
+            # A fresh HTTP cache too, so every start is cold and the user's
+            # cache is left alone
+            cache = os.path.join(directory, 'cache%d' % (count))
+            env = dict(os.environ, XDG_CONFIG_HOME=config, XDG_CACHE_HOME=cache,
+                       LOGLEVEL='WARNING')
+            output = subprocess.check_output(
+                [sys.executable, __file__, '--child', str(count), '--idle', str(args.idle)], env=env)
+            run = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+            results['runs'].append(run)
+            print("%3d overlays: tray %.0fms, started %s, loaded %s, styled %s" % (
+                count, run['cold_start_ms'], run['started_ms'], run['load_finished_ms'],
+                run['tweaks_applied_ms']),
+                file=sys.stderr)
+        server.stop()
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import re
+import logging
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+STREAMKIT_URL = "https://streamkit.discord.com/"
+# How "Use all Rooms" styles voice channels
+VOICE_STYLE = "icon=true&online=true&logo=white&text_color=%23ffffff&text_size=14&text_outline_color=%23000000&text_outline_size=0&text_shadow_color=%23000000&text_shadow_size=0&bg_color=%231e2124&bg_opacity=0.95&bg_shadow_color=%23000000&bg_shadow_size=0&limit_speaking=false&small_avatars=false&hide_names=false&fade_chat=0"
+ROOM_PATH = re.compile(r'^/overlay/(\w+)/(\d+)/(\d+)$')
+
+
+class ChannelList(object):
+    # The streamkit rooms an overlay shows. They are stored as a guild and
+    # a list of channel ids sharing one style query string, rather than a
+    # full url per room, and urls are only built when a page needs them
+    def __init__(self, kind, guild, channels, style='', host=STREAMKIT_URL):
+        self.kind = kind
+        self.guild = guild
+        self.channels = tuple(channels)
+        self.style = style
+        self.host = host
+
+    def key(self):
+        return (self.kind, self.guild, self.channels, self.style, self.host)
+
+    def __eq__(self, other):
+        return isinstance(other, ChannelList) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        return "ChannelList(%r, %r, %r)" % (self.kind, self.guild, self.channels)
+
+    @classmethod
+    def fromUrls(cls, urls):
+        # Everything but the channel ids is taken from the first room
+        channelList = None
+        channels = []
+        for url in urls:
+            parts = urlsplit(url.strip())
+            match = ROOM_PATH.match(parts.path)
+            if not match:
+                logger.warning("Not a streamkit overlay url: %s", url)
+                continue
+            kind, guild, channel = match.groups()
+            host = "%s://%s/" % (parts.scheme, parts.netloc)
+            if channelList is None:
+                channelList = cls(kind, guild, (), parts.query, host)
+            elif (kind, guild, parts.query, host) != (channelList.kind, channelList.guild,
+                                                      channelList.style, channelList.host):
+                logger.warning("Showing %s like the first room of its overlay", url)
+            channels.append(channel)
+        if channelList is None:
+            return None
+        channelList.channels = tuple(channels)
+        return channelList
+
+    @classmethod
+    def fromConfig(cls, config, section):
+        channels = config.get(section, 'channels', fallback=None)
+        if channels:
+            return cls(config.get(section, 'kind', fallback='voice'),
+                       config.get(section, 'guild', fallback='0'),
+                       channels.split(','),
+                       config.get(section, 'style', fallback=''),
+                       config.get(section, 'host', fallback=STREAMKIT_URL))
+        # Written by an older version, see App.migrateConfig
+        urls = config.get(section, 'url', fallback=None)
+        if urls:
+            return cls.fromUrls(urls.split(','))
+        return None
+
+    def save(self, config, section):
+        config.set(section, 'kind', self.kind)
+        config.set(section, 'guild', self.guild)
+        config.set(section, 'channels', ','.join(self.channels))
+        config.set(section, 'style', self.style)
+        if self.host == STREAMKIT_URL:
+            config.remove(section, 'host')
+        else:
+            config.set(section, 'host', self.host)
+        config.remove(section, 'url')
+
+    def only(self, channels):
+        return ChannelList(self.kind, self.guild, channels, self.style, self.host)
+
+    def withStyle(self, style):
+        return ChannelList(self.kind, self.guild, self.channels, style, self.host)
+
+    def isVoice(self):
+        return self.kind == 'voice'
+
+    def url(self, channel):
+        url = "%soverlay/%s/%s/%s" % (self.host, self.kind, self.guild, channel)
+        if self.style:
+            url += '?' + self.style
+        return url
+
+    def urls(self):
+        return [self.url(channel) for channel in self.channels]
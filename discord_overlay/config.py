@@ -0,0 +1,173 @@
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import os
+import stat
+import logging
+import tempfile
+from configparser import ConfigParser
+from PyQt5 import QtCore
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigStore(QtCore.QObject):
+    # Holds discoverlay.ini in memory. The file is parsed once and writes
+    # are coalesced, then written to a temp file and renamed into place so
+    # a crash part way through can never leave a truncated config behind
+    externallyChanged = QtCore.pyqtSignal()
+
+    def __init__(self, fileName, delay=500):
+        super().__init__()
+        self.fileName = fileName
+        self.parser = None
+        self.dirty = False
+        self.mtime = None
+        self.watcher = None
+        self.timer = QtCore.QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self.flush)
+        self.watchTimer = QtCore.QTimer()
+        self.watchTimer.setSingleShot(True)
+        self.watchTimer.setInterval(250)
+        self.watchTimer.timeout.connect(self.checkExternalChange)
+        self.read()
+
+    def statMtime(self):
+        try:
+            return os.stat(self.fileName).st_mtime_ns
+        except OSError:
+            return None
+
+    def read(self):
+        self.parser = ConfigParser(interpolation=None)
+        self.parser.read(self.fileName)
+        self.mtime = self.statMtime()
+        self.dirty = False
+
+    def watch(self):
+        # Editors and our own writes replace the file rather than modify it,
+        # so the directory is watched as well as the file itself
+        if self.watcher:
+            return
+        self.watcher = QtCore.QFileSystemWatcher()
+        self.watcher.addPath(os.path.dirname(self.fileName))
+        if os.path.exists(self.fileName):
+            self.watcher.addPath(self.fileName)
+        self.watcher.fileChanged.connect(self.watchTimer.start)
+        self.watcher.directoryChanged.connect(self.watchTimer.start)
+
+    def checkExternalChange(self):
+        if self.fileName not in self.watcher.files() and os.path.exists(self.fileName):
+            self.watcher.addPath(self.fileName)
+        mtime = self.statMtime()
+        if mtime is None or mtime == self.mtime:
+            return
+        if self.dirty:
+            logger.warning(
+                "%s changed on disk, discarding unsaved changes", self.fileName)
+            self.timer.stop()
+        logger.info("Reloading %s", self.fileName)
+        self.read()
+        self.externallyChanged.emit()
+
+    def sections(self):
+        return self.parser.sections()
+
+    def hasSection(self, section):
+        return self.parser.has_section(section)
+
+    def get(self, section, key, fallback=None):
+        return self.parser.get(section, key, fallback=fallback)
+
+    def getint(self, section, key, fallback=0):
+        try:
+            return self.parser.getint(section, key, fallback=fallback)
+        except ValueError:
+            logger.warning("Invalid integer for %s.%s", section, key)
+            return fallback
+
+    def getfloat(self, section, key, fallback=0.0):
+        try:
+            return self.parser.getfloat(section, key, fallback=fallback)
+        except ValueError:
+            logger.warning("Invalid number for %s.%s", section, key)
+            return fallback
+
+    def getboolean(self, section, key, fallback=False):
+        try:
+            return self.parser.getboolean(section, key, fallback=fallback)
+        except ValueError:
+            logger.warning("Invalid boolean for %s.%s", section, key)
+            return fallback
+
+    def set(self, section, key, value):
+        if isinstance(value, bool) or isinstance(value, int):
+            value = '%d' % (int(value))
+        elif not isinstance(value, str):
+            value = str(value)
+        if not self.parser.has_section(section):
+            self.parser.add_section(section)
+        if self.parser.get(section, key, fallback=None) == value:
+            return
+        self.parser.set(section, key, value)
+        self.save()
+
+    def remove(self, section, key):
+        if self.parser.has_section(section) and self.parser.remove_option(section, key):
+            self.save()
+
+    def removeSection(self, section):
+        if self.parser.remove_section(section):
+            self.save()
+
+    def save(self):
+        self.dirty = True
+        self.timer.start()
+
+    def fileMode(self):
+        try:
+            return stat.S_IMODE(os.stat(self.fileName).st_mode)
+        except OSError:
+            # What open() would have created
+            umask = os.umask(0)
+            os.umask(umask)
+            return 0o666 & ~umask
+
+    def flush(self):
+        self.timer.stop()
+        if not self.dirty:
+            return
+        directory = os.path.dirname(self.fileName)
+        os.makedirs(directory, exist_ok=True)
+        fd, tempName = tempfile.mkstemp(
+            dir=directory, prefix='.discoverlay.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as file:
+                self.parser.write(file)
+                file.flush()
+                os.fsync(file.fileno())
+            # mkstemp makes the file private to us, the config keeps the
+            # permissions it had
+            os.chmod(tempName, self.fileMode())
+            os.replace(tempName, self.fileName)
+            self.mtime = self.statMtime()
+        except OSError as exc:
+            logger.error("Unable to write %s: %s", self.fileName, exc)
+            try:
+                os.unlink(tempName)
+            except OSError:
+                pass
+            return
+        self.dirty = False
+        logger.debug("Wrote %s", self.fileName)
@@ -17,43 +17,192 @@ import base64
 import re
 import json
 import signal
-from configparser import ConfigParser
+import functools
+import collections
+from urllib.parse import urlsplit
 from PyQt5 import QtWidgets, QtGui, QtCore
 from PyQt5.QtCore import pyqtSlot
-from PyQt5.QtWebEngineWidgets import QWebEngineView
-from PyQt5.QtWebChannel import QWebChannel
 from pathlib import Path
-from xdg.BaseDirectory import xdg_config_home
+from xdg.BaseDirectory import xdg_config_home, xdg_cache_home, xdg_data_home
+from .config import ConfigStore
+from .channels import ChannelList, STREAMKIT_URL, VOICE_STYLE
+from .theme import Theme
+from .voicestate import VoiceState, StreamkitBridge
+from .native import VoiceWidget, StreamkitFeed, RecordedFeed
+from .replay import EventRecorder
+from .metrics import PaintClock, MetricsServer, percentiles
+from .executor import ScriptExecutor, runScript
+from . import procstats
 
 logger = logging.getLogger(__name__)
 signal.signal(signal.SIGINT, signal.SIG_DFL)
 
+RIGHT_ALIGN_CSS = 'li.voice-state{ direction:rtl; }.avatar{ float:right !important; }.user{ display:flex; }.voice-container{margin-top:30px;}.voice-container:before{position:fixed;right:0px;top:0px;}'
+CHAT_RESIZE_CSS = 'div.chat-container { width: 100%; height: 100%; top: 0; left: 0; position: fixed; display: flex; flex-direction: column; } div.chat-container > .messages { box-sizing: border-box; width: 100%; flex: 1; }'
+NO_ANIMATION_CSS = '*, *::before, *::after { animation: none !important; transition: none !important; }'
+# Tweaks are split between scripts that run before the page has any
+# content and those that need the DOM to exist
+TWEAK_SCRIPTS = (
+    ('overlay-tweaks-creation', 'DocumentCreation'),
+    ('overlay-tweaks-ready', 'DocumentReady'),
+)
+# Pages being loaded at once while starting up, and how long one may take
+# before the next is started anyway
+STARTUP_CONCURRENCY = 3
+STARTUP_LOAD_TIMEOUT = 10000
+# Megabytes of HTTP cache shared by every overlay
+CACHE_SIZE = 100
+# Hosts streamkit pages load from, the only ones worth pre-warming
+PREWARM_HOSTS = ('streamkit.discord.com', 'cdn.discordapp.com', 'discord.com')
+# Chat messages kept on a chat overlay
+CHAT_LIMIT = 50
+# Seconds without a streamkit event before an overlay stops repainting,
+# 0 to never
+IDLE_AFTER = 0
+# How often overlays are probed for their javascript round trip and event rate
+METRICS_INTERVAL = 15000
+# Latency samples kept per overlay when tracing
+TRACE_SAMPLES = 5000
+# Pixels left around content when a window is fitted to it
+FIT_MARGIN = 2
+
+# QtWebEngine takes a while to start, so it isn't imported until the tray
+# icon is up. See loadWebEngine
+QWebEngineView = QWebEnginePage = QWebEngineScript = QWebEngineProfile = QWebChannel = None
+
+
+def loadWebEngine():
+    # Needs AA_ShareOpenGLContexts set before the QApplication was created
+    global QWebEngineView, QWebEnginePage, QWebEngineScript, QWebEngineProfile, QWebChannel
+    if QWebEngineView is None:
+        from PyQt5.QtWebEngineWidgets import (
+            QWebEngineView, QWebEnginePage, QWebEngineScript, QWebEngineProfile)
+        from PyQt5.QtWebChannel import QWebChannel
+
+
+@functools.lru_cache(maxsize=None)
+def readAsset(name):
+    with open(os.path.join(os.path.dirname(__file__), 'web', name), 'r') as file:
+        return file.read()
+
+
+@functools.lru_cache(maxsize=None)
+def readQtResource(path):
+    file = QtCore.QFile(path)
+    if not file.open(QtCore.QIODevice.ReadOnly):
+        logger.warning("Unable to read %s", path)
+        return ''
+    return bytes(file.readAll()).decode('utf-8')
+
+
+def buildTweakBundle(options):
+    creation = readQtResource(':/qtwebchannel/qwebchannel.js') + \
+        readAsset('dispatcher.js') + readAsset('tweaks.js') + readAsset('framecap.js') + \
+        readAsset('theme.js') + (readAsset('tracer.js') if options.get('trace') else '') + \
+        readAsset('bridge.js') + \
+        "window.overlayTweaks.configure(%s);" % (json.dumps(options, sort_keys=True))
+    ready = readAsset('mutedeaf.js') if options['mutedeaf'] else ''
+    if options.get('chatlimit'):
+        ready += readAsset('chat.js')
+    if options.get('autofit'):
+        ready += readAsset('autofit.js')
+    return (creation, ready)
+
+
+def installTweakBundle(page, bundle):
+    loadWebEngine()
+    scripts = page.scripts()
+    for (name, injectionPoint), source in zip(TWEAK_SCRIPTS, bundle):
+        for script in scripts.findScripts(name):
+            scripts.remove(script)
+        if not source:
+            continue
+        script = QWebEngineScript()
+        script.setName(name)
+        script.setSourceCode(source)
+        script.setInjectionPoint(getattr(QWebEngineScript, injectionPoint))
+        script.setWorldId(QWebEngineScript.MainWorld)
+        script.setRunsOnSubFrames(True)
+        scripts.insert(script)
+
+
+def frameScript(js, expression=False):
+    # A script for the frames of a multiplexed overlay, as a function the
+    # hosting page calls with each frame's window. Its globals are looked up
+    # on that window first, so it runs there much as if it were loaded there
+    if expression:
+        js = "return (%s\n);" % (js.strip().rstrip(';'))
+    return "function(frame) {\nwith (frame) {\n%s\n}\n}" % (js)
+
+
+class PreviewCache(object):
+    # Screenshots of each screen, pre-scaled into a few halving levels.
+    # A screen is only grabbed again once its geometry changes
+
+    def __init__(self, smallest=480, levels=5):
+        self.smallest = smallest
+        self.levels = levels
+        self.entries = {}
+
+    def get(self, screen):
+        geometry = screen.geometry()
+        entry = self.entries.get(screen.name())
+        if entry and entry[0] == geometry:
+            return entry[1]
+        image = screen.grabWindow(0)
+        pyramid = [image]
+        while len(pyramid) < self.levels and image.width() // 2 >= self.smallest:
+            image = image.scaled(image.width() // 2, image.height() // 2,
+                                 QtCore.Qt.IgnoreAspectRatio, QtCore.Qt.SmoothTransformation)
+            pyramid.append(image)
+        self.entries[screen.name()] = (QtCore.QRect(geometry), pyramid)
+        return pyramid
+
+    def invalidate(self, name=None):
+        if name is None:
+            self.entries = {}
+        else:
+            self.entries.pop(name, None)
+
 
 class ResizingImage(QtWidgets.QLabel):
     def __init__(self):
         super().__init__()
-        self.image = None
+        self.images = None
         self.w = 0
         self.h = 0
-
-    def setImage(self, image):
-        self.image = image
+        # Fast scaling while the window is being dragged, then a smooth
+        # pass once it has settled
+        self.settleTimer = QtCore.QTimer()
+        self.settleTimer.setSingleShot(True)
+        self.settleTimer.setInterval(150)
+        self.settleTimer.timeout.connect(self.fillImage)
+
+    def setImage(self, images):
+        self.images = images
         self.fillImage()
 
     def resizeEvent(self, e):
         self.w = e.size().width()
         self.h = e.size().height()
-        self.fillImage()
+        self.fillImage(QtCore.Qt.FastTransformation)
+        self.settleTimer.start()
 
     def sizeHint(self):
-        if self.image:
-            return QtCore.QSize(self.image.width() // 2, self.image.height() // 2)
+        if self.images:
+            return QtCore.QSize(self.images[0].width() // 2, self.images[0].height() // 2)
         return QtCore.QSize(0, 0)
 
-    def fillImage(self):
-        if self.image and self.w > 0 and self.h > 0:
-            self.setPixmap(self.image.scaled(int(self.w), int(
-                self.h), QtCore.Qt.IgnoreAspectRatio, QtCore.Qt.SmoothTransformation))
+    def fillImage(self, mode=QtCore.Qt.SmoothTransformation):
+        if self.images and self.w > 0 and self.h > 0:
+            # Scale down from the smallest level still larger than the label
+            source = self.images[0]
+            for image in self.images:
+                if image.width() < self.w or image.height() < self.h:
+                    break
+                source = image
+            self.setPixmap(source.scaled(int(self.w), int(
+                self.h), QtCore.Qt.IgnoreAspectRatio, mode))
 
 
 class AspectRatioWidget(QtWidgets.QWidget):
@@ -96,47 +245,454 @@ class AspectRatioWidget(QtWidgets.QWidget):
         self.layout().setStretch(2, outer_stretch)
 
 
+class ScreenRegistry(QtCore.QObject):
+    # The screens by name, kept up to date from Qt's signals rather than
+    # looked up on every call. However many signals a hotplug causes,
+    # changed is emitted once on the next event loop turn
+    changed = QtCore.pyqtSignal()
+
+    def __init__(self, app, previews):
+        super().__init__()
+        self.app = app
+        self.previews = previews
+        self.screens = {}
+        self.timer = QtCore.QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(0)
+        self.timer.timeout.connect(self.flush)
+        app.screenAdded.connect(self.screenAdded)
+        app.screenRemoved.connect(self.screenRemoved)
+        app.primaryScreenChanged.connect(self.topologyChanged)
+        for screen in app.screens():
+            self.watch(screen)
+        self.refresh()
+
+    def watch(self, screen):
+        screen.geometryChanged.connect(self.topologyChanged)
+        screen.availableGeometryChanged.connect(self.topologyChanged)
+
+    def screenAdded(self, screen):
+        self.watch(screen)
+        self.topologyChanged()
+
+    def screenRemoved(self, screen):
+        # Gone before the flush, so never handed out again
+        self.screens.pop(screen.name(), None)
+        self.topologyChanged()
+
+    def topologyChanged(self, *args):
+        self.timer.start()
+
+    def refresh(self):
+        self.screens = dict((screen.name(), screen) for screen in self.app.screens())
+        self.previews.invalidate()
+        logger.debug("Discovered screens: %r", list(self.screens))
+
+    def flush(self):
+        self.refresh()
+        self.changed.emit()
+
+    def names(self):
+        return list(self.screens)
+
+    def get(self, name):
+        # None when falling back to the primary screen
+        return self.screens.get(name)
+
+    def primary(self):
+        return self.app.primaryScreen()
+
+
+class GeometryScheduler(QtCore.QObject):
+    # Collects geometry changes and applies at most one per widget per
+    # display frame, so dragging a slider doesn't relayout on every tick
+
+    def __init__(self, app):
+        super().__init__()
+        self.app = app
+        self.pending = {}
+        self.applied = 0
+        self.collapsed = 0
+        self.timer = QtCore.QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.apply)
+
+    def frameInterval(self):
+        screen = self.app.primaryScreen()
+        rate = screen.refreshRate() if screen else 60
+        if rate <= 0:
+            rate = 60
+        return max(1, int(1000 / rate))
+
+    def schedule(self, widget, rect, mask=None):
+        # An empty mask clears the widget's, None leaves it alone
+        if widget in self.pending:
+            self.collapsed += 1
+        self.pending[widget] = (rect, mask)
+        if not self.timer.isActive():
+            self.timer.start(self.frameInterval())
+
+    def cancel(self, widget):
+        self.pending.pop(widget, None)
+
+    def place(self, widget, rect, mask=None):
+        # Right away, for a window about to be shown, whose first frame
+        # would otherwise be drawn where it was last
+        self.cancel(widget)
+        self.setGeometry(widget, rect, mask)
+        self.applied += 1
+
+    def setGeometry(self, widget, rect, mask):
+        widget.resize(rect.size())
+        widget.move(rect.topLeft())
+        if mask is None:
+            return
+        if mask.isEmpty():
+            widget.clearMask()
+        else:
+            widget.setMask(mask)
+
+    def apply(self):
+        pending = self.pending
+        self.pending = {}
+        for widget, (rect, mask) in pending.items():
+            self.setGeometry(widget, rect, mask)
+        self.applied += len(pending)
+
+    def stats(self):
+        return {'applied': self.applied, 'collapsed': self.collapsed}
+
+
 class App(QtCore.QObject):
+    started = QtCore.pyqtSignal()
 
     def __init__(self, our_app):
         super().__init__()
         self.app = our_app
         self.overlays = []
         self.configDir = os.path.join(xdg_config_home, "discord-overlay")
+        self.cacheDir = os.path.join(xdg_cache_home, "discord-overlay")
+        self.dataDir = os.path.join(xdg_data_home, "discord-overlay")
         self.streamkitUrlFileName = os.path.join(self.configDir, "discordurl")
         self.configFileName = os.path.join(self.configDir, "discoverlay.ini")
+        self.config = None
+        # Sections saved since the last reconcile, see reconcileLater
+        self.pendingChanges = None
+        self.geometry = GeometryScheduler(our_app)
+        self.voiceState = VoiceState()
+        self.recorder = EventRecorder.fromEnvironment()
+        self.previews = PreviewCache()
+        self.screens = ScreenRegistry(our_app, self.previews)
+        self.screens.changed.connect(self.screensChanged)
         self.settings = None
         self.presets = None
+        self.profile = None
+        self.prewarmPage = None
+        # The streamkit browser shared by every overlay's layout window
+        self.settingsView = None
+        self.settingsViewOwner = None
+        self.settingsViewReady = False
+        self.resourceStats = {'cached': 0, 'total': 0}
+        self.metricsServer = None
+        self.metricsTimer = QtCore.QTimer()
+        self.metricsTimer.setInterval(METRICS_INTERVAL)
+        self.metricsTimer.timeout.connect(self.probeOverlays)
+        # Overlays waiting to be loaded, and those loading, while starting up
+        self.starting = True
+        self.loadQueue = []
+        self.loading = set()
+        self.phases = []
+        self.startupClock = QtCore.QElapsedTimer()
+        self.startupClock.start()
+        self.phaseStart = 0
 
     def main(self):
         os.makedirs(self.configDir, exist_ok=True)
-        config = ConfigParser(interpolation=None)
-        config.read(self.configFileName)
-        for section in config.sections():
-            if not section == 'core':
-                url_list = config.get(
-                    section, 'url', fallback=None)
-                if url_list:
-                    for url in url_list.split(","):
-
-                        overlay = Overlay(
-                            self, self.configFileName, section, url)
-                        overlay.load()
-                        self.overlays.append(overlay)
+        self.config = ConfigStore(self.configFileName)
+        self.app.aboutToQuit.connect(self.config.flush)
+        if self.recorder:
+            self.app.aboutToQuit.connect(self.recorder.close)
+        self.migrateConfig()
+        self.phase('config')
+        self.app.setQuitOnLastWindowClosed(False)
+        self.createSysTrayIcon()
+        self.phase('tray')
+        port = self.config.getint('core', 'metrics_port', fallback=0)
+        if port:
+            self.metricsServer = MetricsServer(self)
+            self.metricsServer.start(port)
+        self.metricsTimer.start()
+        # Give the event loop a turn to show the tray icon first
+        QtCore.QTimer.singleShot(0, self.startOverlays)
+
+    def startOverlays(self):
+        loadWebEngine()
+        self.webProfile()
+        self.prewarmCache()
+        self.phase('webengine')
+        self.reconcile()
         if len(self.overlays) == 0:
-            overlay = Overlay(self, self.configFileName, 'main', None)
+            overlay = Overlay(self, 'main', None)
             overlay.load()
             self.overlays.append(overlay)
             self.showPresetWindow()
-        self.app.setQuitOnLastWindowClosed(False)
-        self.createSysTrayIcon()
+        self.config.externallyChanged.connect(self.configChanged)
+        self.config.watch()
+
+    def webProfile(self):
+        # One profile for every page, so streamkit's scripts, fonts and
+        # avatars are fetched once and kept on disk between runs. Chromium
+        # evicts the least recently used entries once the cap is reached
+        if self.profile is None:
+            loadWebEngine()
+            size = self.config.getint('core', 'cache_size', fallback=CACHE_SIZE)
+            self.profile = QWebEngineProfile('discord-overlay', self.app)
+            self.profile.setCachePath(self.cacheDir)
+            # Cookies and local storage too, rather than wherever QtWebEngine
+            # keeps them for the application name
+            self.profile.setPersistentStoragePath(os.path.join(self.dataDir, 'profile'))
+            self.profile.setHttpCacheType(QWebEngineProfile.DiskHttpCache)
+            self.profile.setHttpCacheMaximumSize(max(0, size) * 1024 * 1024)
+            logger.debug("HTTP cache in %s, up to %dMB", self.profile.cachePath(), size)
+        return self.profile
+
+    def newPage(self, parent=None):
+        return QWebEnginePage(self.webProfile(), parent)
+
+    def prewarmCache(self):
+        # Fetch every url listed in urls.txt of the cache_prewarm directory,
+        # so even the first overlay to load finds them in the cache. Only
+        # urls from hosts the overlays load from anyway are fetched
+        directory = self.config.get('core', 'cache_prewarm', fallback=None)
+        if not directory:
+            return
+        manifest = os.path.join(os.path.expanduser(directory), 'urls.txt')
+        try:
+            with open(manifest, 'r') as file:
+                urls = [line.strip() for line in file
+                        if line.strip() and not line.startswith('#')]
+        except OSError as exc:
+            logger.warning("Unable to read cache manifest %s: %s", manifest, exc)
+            return
+        for url in [url for url in urls if urlsplit(url).hostname not in PREWARM_HOSTS]:
+            logger.warning("Not pre-warming %s, it isn't served by streamkit", url)
+            urls.remove(url)
+        if not urls:
+            return
+        self.prewarmPage = self.newPage()
+        self.prewarmPage.loadFinished.connect(functools.partial(self.fetchPrewarm, urls))
+        self.prewarmPage.setHtml('', QtCore.QUrl(STREAMKIT_URL))
+
+    def fetchPrewarm(self, urls, ok):
+        js = "Promise.all(%s.map(function(url) { return fetch(url, {mode: 'no-cors'}).catch(function() {}); })).then(function() { window.prewarmed = true; });"
+        self.prewarmPage.runJavaScript(js % (json.dumps(urls)))
+        logger.debug("Pre-warming the cache with %d urls", len(urls))
+        # Plenty of time for the fetches, the page is of no use after
+        QtCore.QTimer.singleShot(30000, self.prewarmDone)
+
+    def prewarmDone(self):
+        if self.prewarmPage:
+            self.prewarmPage.deleteLater()
+            self.prewarmPage = None
+
+    def settingsViewUser(self, overlay):
+        # The other overlay whose open settings window shows the view, if any
+        owner = self.settingsViewOwner
+        if owner is None or owner is overlay or owner.settings is None:
+            return None
+        return owner if owner.settings.isVisible() else None
+
+    def borrowSettingsView(self, overlay):
+        # Streamkit is only loaded once. The page keeps the guild and channel
+        # lists it caught, so moving it to another overlay's window is instant.
+        # It isn't taken from a window that is still open
+        if self.settingsViewUser(overlay):
+            return None
+        if self.settingsView is None:
+            loadWebEngine()
+            self.settingsView = QWebEngineView()
+            self.settingsView.setPage(self.newPage(self.settingsView))
+            self.settingsView.loadFinished.connect(self.prepareSettingsView)
+            self.settingsView.load(QtCore.QUrl(STREAMKIT_URL + "overlay"))
+        self.settingsViewOwner = overlay
+        if self.settingsViewReady:
+            overlay.chooseStreamkitType()
+        return self.settingsView
+
+    def releaseSettingsView(self, overlay):
+        # Take it out of the window before that is deleted along with it
+        if self.settingsView is not None and self.settingsViewOwner is overlay:
+            self.settingsView.hide()
+            self.settingsView.setParent(None)
+            self.settingsViewOwner = None
+
+    @pyqtSlot()
+    def prepareSettingsView(self):
+        skipIntro = "buttons = document.getElementsByTagName('button');for(i=0;i<buttons.length;i++){if(buttons[i].innerHTML=='Install for OBS'){buttons[i].click()}}"
+        hideLogo = "document.getElementsByClassName('install-logo')[0].style.setProperty('display','none');"
+        resizeContents = "document.getElementsByClassName('content')[0].style.setProperty('top','30px');"
+        resizeHeader = "document.getElementsByClassName('header')[0].style.setProperty('height','35px');"
+        hidePreview = "document.getElementsByClassName('config-link')[0].style.setProperty('height','300px');document.getElementsByClassName('config-link')[0].style.setProperty('overflow','hidden');"
+        hideClose = "document.getElementsByClassName('close')[0].style.setProperty('display','none');"
+        catchGuild = "window.overlayDispatcher.register('guild', 'GET_GUILD', function(input){window.guilds=input.data.id})"
+        catchChannel = "window.overlayDispatcher.register('channels', 'GET_CHANNELS', function(input){window.channels = input.data.channels;})"
+
+        # Sent to the page as one batch
+        page = self.settingsView.page()
+        for js in (skipIntro, hideLogo, resizeContents, hidePreview, resizeHeader,
+                   hideClose, readAsset('dispatcher.js'), catchGuild, catchChannel):
+            runScript(page, js)
+        self.settingsViewReady = True
+        if self.settingsViewOwner:
+            self.settingsViewOwner.chooseStreamkitType()
+
+    def countResources(self, cached, total):
+        self.resourceStats['cached'] += cached
+        self.resourceStats['total'] += total
+        logger.debug("HTTP cache served %d of %d resources so far",
+                     self.resourceStats['cached'], self.resourceStats['total'])
+
+    def migrateConfig(self):
+        # Older versions stored a full url per room in one 'url' value
+        for section in self.config.sections():
+            if section != 'core' and self.config.get(section, 'url', fallback=None):
+                channelList = ChannelList.fromConfig(self.config, section)
+                if channelList:
+                    logger.info("Storing the rooms of %s as a channel list", section)
+                    channelList.save(self.config, section)
+
+    def phase(self, name):
+        now = self.startupClock.elapsed()
+        self.phases.append((name, now - self.phaseStart))
+        self.phaseStart = now
+
+    def startupPriority(self, overlay):
+        # Voice overlays on the primary screen are what people look for
+        # first. An overlay without a screen falls back to the primary one
+        primary = self.app.primaryScreen()
+        screen = self.config.get(overlay.name, 'screen', fallback='None')
+        onPrimary = primary is None or screen in ('None', primary.name())
+        channelList = ChannelList.fromConfig(self.config, overlay.name)
+        voice = bool(channelList and channelList.isVoice())
+        return (not onPrimary, not voice)
+
+    def loadOverlay(self, overlay):
+        if self.starting:
+            self.loadQueue.append(overlay)
+        else:
+            overlay.load()
 
-    def reinit(self):
+    def loadNext(self):
+        limit = max(1, self.config.getint('core', 'startup_concurrency',
+                                          fallback=STARTUP_CONCURRENCY))
+        self.loadQueue.sort(key=self.startupPriority)
+        while self.loadQueue and len(self.loading) < limit:
+            overlay = self.loadQueue.pop(0)
+            overlay.load()
+            # Disabled and recorded overlays have no page to wait for
+            if overlay.webPage() is not None:
+                self.loading.add(overlay)
+                QtCore.QTimer.singleShot(STARTUP_LOAD_TIMEOUT,
+                                         functools.partial(self.overlayLoaded, overlay, True))
+        if self.starting and not self.loadQueue and not self.loading:
+            self.starting = False
+            self.phase('overlays')
+            logger.info("Started in %dms: %s", self.startupClock.elapsed(),
+                        ', '.join('%s %dms' % (name, ms) for name, ms in self.phases))
+            self.started.emit()
+
+    def overlayLoaded(self, overlay, timedOut=False):
+        if overlay not in self.loading:
+            return
+        if timedOut:
+            logger.warning("Overlay %s is slow to load, loading the next", overlay.name)
+        self.loading.discard(overlay)
+        self.loadNext()
+
+    def forgetOverlay(self, overlay):
+        overlay.delete()
+        self.overlays.remove(overlay)
+        self.loading.discard(overlay)
+        if overlay in self.loadQueue:
+            self.loadQueue.remove(overlay)
+
+    def desiredOverlays(self):
+        desired = []
+        config = self.config
+        for section in config.sections():
+            if not section == 'core':
+                channelList = ChannelList.fromConfig(config, section)
+                if channelList and channelList.channels:
+                    # A multiplexed overlay renders every room in one view
+                    if config.getboolean(section, 'multiplex', fallback=True):
+                        desired.append((section, channelList.channels))
+                    else:
+                        for channel in channelList.channels:
+                            desired.append((section, (channel,)))
+        return desired
+
+    def reconcile(self, changed=None):
+        # Bring the live overlays in line with the config, only touching
+        # those that were added, removed or belong to a changed section
+        desired = self.desiredOverlays()
+        configured = set(name for name, channels in desired)
+        live = {}
+        for overlay in list(self.overlays):
+            key = (overlay.name, overlay.channelIds)
+            if key in desired and key not in live:
+                live[key] = overlay
+            elif overlay.channelIds is None and overlay.name not in configured:
+                # Added from the preset window but no room chosen yet
+                continue
+            else:
+                logger.debug("Removing overlay %s %s", overlay.name, overlay.channelIds)
+                self.forgetOverlay(overlay)
+
+        for key in desired:
+            overlay = live.get(key)
+            if overlay:
+                # A queued overlay reads the latest config when its turn comes
+                if overlay in self.loadQueue:
+                    continue
+                if changed is None or overlay.name in changed:
+                    overlay.load()
+            else:
+                logger.debug("Creating overlay %s %s", key[0], key[1])
+                overlay = Overlay(self, key[0], key[1])
+                self.overlays.append(overlay)
+                self.loadOverlay(overlay)
+        if self.starting:
+            self.loadNext()
+
+    def reconcileLater(self, changed):
+        # Overlays save from their own callbacks, and reconciling may
+        # delete the overlay that saved, so it waits for the next turn of
+        # the event loop. Saves before then share one reconcile
+        if self.pendingChanges is None:
+            self.pendingChanges = set()
+            QtCore.QTimer.singleShot(0, self.reconcilePending)
+        self.pendingChanges.update(changed)
+
+    def reconcilePending(self):
+        changed = self.pendingChanges
+        self.pendingChanges = None
+        if changed:
+            self.reconcile(changed=changed)
+
+    def screensChanged(self):
+        # Every overlay is placed again in one pass, and the geometry
+        # scheduler applies all of the moves together on the next frame
         for overlay in self.overlays:
-            overlay.delete()
-        self.trayIcon.hide()
-        self.__init__(self.app)
-        self.main()
+            if overlay.position:
+                overlay.populateScreenList()
+            elif overlay.overlay:
+                # Others are placed when they load
+                overlay.chooseScreen()
+
+    def configChanged(self):
+        self.reconcile()
+        if self.presets and self.presets.isVisible():
+            self.fillPresetWindow()
 
     def createSysTrayIcon(self):
         trayImgBase64 = "iVBORw0KGgoAAAANSUhEUgAAACAAAAAgCAYAAABzenr0AAAABmJLR0QA/wD/AP+gvaeTAAAACXBIWXMAAC4jAAAuIwF4pT92AAAAB3RJTUUH5AUEDxsTIFcmagAAABl0RVh0Q29tbWVudABDcmVhdGVkIHdpdGggR0lNUFeBDhcAAAN+SURBVFjDzZcxaCJpGIafmTuyisVgsDCJiyApR3FAokmjsT5juuC0l2BzjVyfwv5Ic43EW0ijWCb2JtMEZxFGximDMKzhLIaYKcK4zeaKM8ux5A5vN8Pmbef/53t4v3/+eT+B5fUGSAKbwAawCgQXzzzgDrgFboAR8HGZlwpLrFkD8sBWo9EQ0+k0sViMcDhMIBAAYD6fM5vNmEwmDIdDqtXqJ+A9oAF/fgvAXqFQKB4fH5PL5ZhOp1iWhWmaGIaBYRgAKIqCoiikUilkWSYajdLv96nX61xdXfWAi/8LsAao7Xb7bblcxrIsWq0WkiSRz+dJJBJEIhGCwb874HkejuMwHo/RNA3XdVFVFVmWOT8/p1KpfABaz7nxHEAC+FnX9VA8HqfZbCJJEqVSiXg8vtRhsW2bbreL67ocHh5i2zbZbPYB+AMY/xfAGvDLaDQKCYLA3t4enU6HTCbD12gwGHBwcMDFxQWPj48kk8kH4Pd/OiF+sUfVdT0kCAK1Wo1er/fVxQEymQy9Xo9arYYgCOi6HgLUf3Ngr91uF3d3d9nZ2aHX6y1t+TItKRaLXF9fc3l5SaVS+XwwnxxYKxQKxXK5TLPZpNPpvFhxgHg8TqfTodlsUi6XKRQKxUW7+WGx5qd3797F7u/vcRyH/f19Xlrr6+uYpsnKygrb29ucnZ39CFji4obbyuVytFotSqUSfqlUKtFqtcjlcgBbwBsRSDYaDXE6nSJJ0ota/1wrJEliOp3SaDREICkCm+l0GsuyyOfz+K18Po9lWaTTaYBNEdiIxWKYpkkikfAdIJFIYJomsVgMYEMEVsPhMIZhEIlEfAeIRCIYhkE4HAZYFYFgIBDAMIzPd7ufCgaDGIbx9CcNinxniYA3n89RFAXP83wv6HkeiqIwn88BPBG4m81mKIqC4zi+AziOg6IozGYzgDsRuJ1MJqRSKcbjse8A4/GYVCrFZDIBuBWBm+FwiCzLaJrmO4CmaciyzHA4BLgRgVG1Wv0UjUZxXRfbtn0rbts2rusSjUafcuNIXKTX9/1+H1VV6Xa7vgF0u11UVaXf77MIrR+fPkOtXq8jyzKu6zIYDF68+GAwwHVdZFmmXq+zSMzfP5B8mQl/1XX9bSgUolarcXp6+s0Qtm1zdHTEyckJDw8PZLPZD8BvryaUvrpY/ioGk1cxmr2a4dT38fwv9cLeiMwLuMsAAAAASUVORK5CYII="
@@ -147,11 +703,41 @@ class App(QtCore.QObject):
         self.trayMenu = QtWidgets.QMenu()
         self.showAction3 = self.trayMenu.addAction("Settings")
         self.showAction3.triggered.connect(self.showPresetWindow)
+        self.metricsMenu = self.trayMenu.addMenu("Performance")
+        self.metricsMenu.aboutToShow.connect(self.fillMetricsMenu)
         self.exitAction = self.trayMenu.addAction("Close")
         self.exitAction.triggered.connect(self.exit)
         self.trayIcon.setContextMenu(self.trayMenu)
         self.trayIcon.show()
 
+    def probeOverlays(self):
+        for overlay in self.overlays:
+            overlay.probe()
+
+    def fillMetricsMenu(self):
+        self.metricsMenu.clear()
+        for overlay in self.overlays:
+            values = overlay.metrics()
+            parts = []
+            if values['load_seconds'] is not None:
+                parts.append("load %dms" % (values['load_seconds'] * 1000))
+            if values['js_roundtrip_seconds'] is not None:
+                parts.append("js %dms" % (values['js_roundtrip_seconds'] * 1000))
+            parts.append("%.1f events/s" % (overlay.eventRate))
+            if values['renderer_rss_bytes'] is not None:
+                parts.append("%dMB" % (values['renderer_rss_bytes'] / 1048576))
+            if values['seconds_since_paint'] is not None:
+                parts.append("painted %.0fs ago" % (values['seconds_since_paint']))
+            quantiles = overlay.latencyQuantiles().get('frame')
+            if quantiles:
+                parts.append("speaking p95 %.0fms" % (quantiles[0.95]))
+            action = self.metricsMenu.addAction("%s: %s" % (overlay.name, ', '.join(parts)))
+            action.setEnabled(False)
+        if self.metricsServer and self.metricsServer.isListening():
+            action = self.metricsMenu.addAction(
+                "http://127.0.0.1:%d/metrics" % (self.metricsServer.serverPort()))
+            action.setEnabled(False)
+
     def showPresetWindow(self):
         self.presets = QtWidgets.QMainWindow()
         self.presets.setWindowTitle('Configure overlays')
@@ -196,8 +782,7 @@ class App(QtCore.QObject):
 
     def addOverlay(self, button=None):
         if re.match('^[a-z]+$', self.textbox.text()):
-            overlay = Overlay(self, self.configFileName,
-                              self.textbox.text(), None)
+            overlay = Overlay(self, self.textbox.text(), None)
             overlay.load()
             self.overlays.append(overlay)
             self.fillPresetWindow()
@@ -209,43 +794,114 @@ class App(QtCore.QObject):
 
     def deleteOverlay(self, overlay):
         n = overlay.name
-        overlay.delete()
-        for overlayToo in self.overlays:
+        for overlayToo in list(self.overlays):
             if overlayToo.name == n:
-                self.overlays.remove(overlayToo)
+                self.forgetOverlay(overlayToo)
         # self.overlays.remove(overlay)
-        config = ConfigParser(interpolation=None)
-        config.read(self.configFileName)
-        config.remove_section(n)
-        with open(self.configFileName, 'w') as file:
-            config.write(file)
+        self.config.removeSection(n)
         self.fillPresetWindow()
 
     def exit(self):
+        self.config.flush()
         self.app.quit()
 
 
 class Overlay(QtCore.QObject):
 
-    def __init__(self, up, configFileName, name, url):
+    def __init__(self, up, name, channelIds):
         super().__init__()
-        self.configFileName = configFileName
+        self.config = up.config
         self.parent = up
         self.app = up.app
-        self.url = url
+        # The rooms of the section this overlay shows, all of them unless
+        # the section has one overlay per room
+        self.channelIds = channelIds
+        self.channelList = None
         self.size = None
         self.name = name
         self.overlay = None
         self.settings = None
         self.position = None
         self.enabled = True
+        self.right = False
         self.showtitle = True
         self.mutedeaf = True
-        self.showtitle = True
+        self.chatresize = True
+        self.hideinactive = True
+        self.chatlimit = CHAT_LIMIT
+        self.maxfps = 0
+        self.animations = True
+        self.idleafter = IDLE_AFTER
+        self.theme = Theme()
+        # Shrinking the window to what the page draws, see contentFit
+        self.autofit = False
+        self.contentBounds = None
+        self.fit = None
+        self.multiplex = True
+        self.tweakBundle = None
+        self.tweakBundleOptions = None
+        self.bridge = None
+        self.webChannel = None
+        self.roomStates = {}
+        self.renderer = 'web'
+        self.feedFile = None
+        self.feed = None
+        # Chromium lifecycle state the page is parked in, if any
+        self.parked = None
+        self.parkedRss = None
+        self.waking = False
+        self.wakeTimer = QtCore.QElapsedTimer()
+        self.lifecycle = {'parked': 0, 'woken': 0, 'wake_ms': None, 'reclaimed_bytes': None}
+        # A frozen page can't hear that we joined the room. It is thawed as
+        # soon as any page reports on one of its rooms, and now and then in
+        # case none does, then frozen again once the events stop
+        self.thawTimer = QtCore.QTimer()
+        self.thawTimer.setInterval(30000)
+        self.thawTimer.timeout.connect(self.thaw)
+        self.refreezeTimer = QtCore.QTimer()
+        self.refreezeTimer.setSingleShot(True)
+        self.refreezeTimer.setInterval(300)
+        self.refreezeTimer.timeout.connect(self.refreeze)
+        # The page thawed last, which a refreeze must still be showing
+        self.thawedPage = None
+        # Figures for the metrics endpoint and tray summary
+        self.loadClock = QtCore.QElapsedTimer()
+        self.loadMs = None
+        self.roundTripMs = None
+        self.paintClock = PaintClock()
+        self.eventsSeen = 0
+        self.eventRate = 0.0
+        self.rateEvents = 0
+        self.rateClock = QtCore.QElapsedTimer()
+        # Milliseconds from a voice event arriving to the DOM changing, and
+        # to the next frame after that
+        self.latency = {
+            'mutation': collections.deque(maxlen=TRACE_SAMPLES),
+            'frame': collections.deque(maxlen=TRACE_SAMPLES),
+        }
+        self.statsTimer = QtCore.QTimer()
+        self.statsTimer.setInterval(60000)
+        self.statsTimer.timeout.connect(self.logStats)
+        self.parent.voiceState.changed.connect(self.on_voice_state)
+
+    @property
+    def url(self):
+        if not self.channelList:
+            return None
+        return ','.join(self.channelList.urls())
+
+    def isVoice(self):
+        return bool(self.channelList and self.channelList.isVoice())
+
+    def tweakState(self):
+        return (self.url, self.right, self.mutedeaf, self.chatresize,
+                self.showtitle, self.hideinactive, self.chatlimit, self.maxfps,
+                self.animations, self.idleafter, self.theme.query(), self.autofit, self.multiplex,
+                self.renderer, self.feedFile)
 
     def load(self):
-        config = ConfigParser(interpolation=None)
-        config.read(self.configFileName)
+        config = self.config
+        previous = self.tweakState()
         self.posXL = config.getint(self.name, 'xl', fallback=0)
         self.posXR = config.getint(self.name, 'xr', fallback=200)
         self.posYT = config.getint(self.name, 'yt', fallback=50)
@@ -256,58 +912,166 @@ class Overlay(QtCore.QObject):
         self.chatresize = config.getboolean(
             self.name, 'chatresize', fallback=True)
         self.screenName = config.get(self.name, 'screen', fallback='None')
-        #self.url = config.get(self.name, 'url', fallback=None)
+        channelList = ChannelList.fromConfig(config, self.name)
+        if channelList and self.channelIds:
+            self.channelList = channelList.only(self.channelIds)
         self.enabled = config.getboolean(self.name, 'enabled', fallback=True)
         self.showtitle = config.getboolean(self.name, 'title', fallback=True)
         self.hideinactive = config.getboolean(
             self.name, 'hideinactive', fallback=True)
+        self.multiplex = config.getboolean(
+            self.name, 'multiplex', fallback=True)
+        # 0 keeps every message
+        self.chatlimit = config.getint(self.name, 'chatlimit', fallback=CHAT_LIMIT)
+        # Render budget, 0 for either means no limit
+        self.maxfps = config.getint(self.name, 'maxfps', fallback=0)
+        self.animations = config.getboolean(self.name, 'animations', fallback=True)
+        self.idleafter = config.getint(self.name, 'idleafter', fallback=IDLE_AFTER)
+        self.theme = Theme.fromConfig(config, self.name)
+        self.autofit = config.getboolean(self.name, 'autofit', fallback=False)
+        self.renderer = config.get(self.name, 'renderer', fallback='web')
+        # A recorded event file to draw from instead of streamkit
+        self.feedFile = config.get(self.name, 'feed', fallback=None)
         self.chooseScreen()
         # TODO Check, is there a better logic location for this?
-        if self.enabled:
+        if not self.enabled:
+            self.disableOverlay()
+        elif not self.overlay:
             self.showOverlay()
+        elif self.parked == QWebEnginePage.LifecycleState.Discarded:
+            self.wake()
+        elif previous != self.tweakState():
+            # Settings changed underneath a live overlay
+            if previous[-2:] != self.tweakState()[-2:]:
+                self.hideOverlay()
+                self.showOverlay()
+            elif previous[0] != self.url or previous[-3] != self.multiplex or previous[1] != self.right:
+                self.installTweaks()
+                self.loadUrl()
+            else:
+                self.applyTweaks()
 
-    def moveOverlay(self):
+    def moveOverlay(self, now=False):
         if self.overlay:
-            self.overlay.resize(self.posXR-self.posXL, self.posYB-self.posYT)
-            self.overlay.move(self.posXL + self.screenOffset.left(),
-                              self.posYT + self.screenOffset.top())
+            self.fit = self.contentFit(self.posXR-self.posXL, self.posYB-self.posYT)
+            (x, y, width, height), shape = self.fit
+            mask = QtGui.QRegion()
+            for rect in shape:
+                mask = mask.united(QtGui.QRegion(*rect))
+            place = self.parent.geometry.place if now else self.parent.geometry.schedule
+            place(self.overlay, QtCore.QRect(
+                self.posXL + self.screenOffset.left() + x,
+                self.posYT + self.screenOffset.top() + y,
+                width, height), mask)
+
+    def contentFit(self, width, height):
+        # The part of a width by height box the window takes, and the shape
+        # of what is drawn in it, in window coordinates. The window keeps
+        # the top edge of the box, and the left or right edge it is aligned to
+        if not (self.autofit and self.contentBounds and isinstance(self.overlay, QWebEngineView)):
+            return ((0, 0, width, height), ())
+        viewport, rects = self.contentBounds
+        # Measured in the window as it was, which right alignment pins to
+        # the right edge of the box
+        shift = width - viewport if self.right else 0
+        box = QtCore.QRect(0, 0, width, height)
+        drawn = []
+        for x, y, w, h in rects:
+            rect = QtCore.QRect(int(x) + shift, int(y), int(w), int(h)).adjusted(
+                -FIT_MARGIN, -FIT_MARGIN, FIT_MARGIN, FIT_MARGIN).intersected(box)
+            if not rect.isEmpty():
+                drawn.append(rect)
+        if not drawn:
+            # Nobody to show, but the window has to have a size
+            return ((width - 1 if self.right else 0, 0, 1, 1), ())
+        bounds = functools.reduce(QtCore.QRect.united, drawn)
+        left = bounds.left() if self.right else 0
+        right = width if self.right else bounds.right() + 1
+        return ((left, 0, right - left, bounds.bottom() + 1),
+                tuple((rect.x() - left, rect.y(), rect.width(), rect.height()) for rect in drawn))
+
+    def gotBounds(self, width, rects):
+        self.contentBounds = (width, rects)
+        if self.overlay and self.contentFit(self.posXR-self.posXL, self.posYB-self.posYT) != self.fit:
+            self.moveOverlay()
+
+    def isMultiplexed(self):
+        return bool(self.multiplex and self.channelList and len(self.channelList.channels) > 1)
+
+    def isNative(self):
+        # Only the voice widget has a native renderer
+        return bool(self.renderer == 'native' and self.isVoice())
+
+    def webPage(self):
+        if isinstance(self.overlay, QWebEngineView):
+            return self.overlay.page()
+        if isinstance(self.feed, StreamkitFeed):
+            return self.feed.page
+        return None
+
+    def loadUrl(self):
+        if isinstance(self.overlay, VoiceWidget):
+            self.configureNative()
+        page = self.webPage()
+        if not page or not self.channelList:
+            return
+        if self.isMultiplexed():
+            html = readAsset('multiplex.html')
+            html = html.replace('%URLS%', json.dumps(self.channelList.urls()))
+            html = html.replace('%RIGHT%', json.dumps(self.right))
+            page.setHtml(html, QtCore.QUrl(STREAMKIT_URL))
+        else:
+            page.load(QtCore.QUrl(self.url))
+        self.loadClock.start()
 
     def on_url(self, url):
-        if self.overlay:
-            self.overlay.load(QtCore.QUrl(url))
-        self.url = url
-        self.save()
+        channelList = ChannelList.fromUrls([url])
+        # Closed first, saving may replace this overlay
+        self.closeSettings()
+        if channelList:
+            self.setChannelList(channelList)
+            self.save()
+
+    def setChannelList(self, channelList):
+        self.channelList = channelList
+        self.channelIds = channelList.channels
+        channelList.save(self.config, self.name)
+        self.loadUrl()
+
+    def closeSettings(self):
+        if self.settings is None:
+            return
+        self.parent.releaseSettingsView(self)
         self.settings.close()
         self.settings = None
 
     def on_save_position(self, url):
+        logger.debug("Geometry updates: %(applied)d applied, %(collapsed)d collapsed",
+                     self.parent.geometry.stats())
         self.save()
         self.position.close()
         self.position = None
 
     @pyqtSlot()
     def save(self):
-        config = ConfigParser(interpolation=None)
-        config.read(self.configFileName)
-        if not config.has_section(self.name):
-            config.add_section(self.name)
-        config.set(self.name, 'xl', '%d' % (self.posXL))
-        config.set(self.name, 'xr', '%d' % (self.posXR))
-        config.set(self.name, 'yt', '%d' % (self.posYT))
-        config.set(self.name, 'yb', '%d' % (self.posYB))
-        config.set(self.name, 'rightalign', '%d' % (int(self.right)))
-        config.set(self.name, 'mutedeaf', '%d' % (int(self.mutedeaf)))
-        config.set(self.name, 'chatresize', '%d' % (int(self.chatresize)))
+        config = self.config
+        config.set(self.name, 'xl', self.posXL)
+        config.set(self.name, 'xr', self.posXR)
+        config.set(self.name, 'yt', self.posYT)
+        config.set(self.name, 'yb', self.posYB)
+        config.set(self.name, 'rightalign', self.right)
+        config.set(self.name, 'mutedeaf', self.mutedeaf)
+        config.set(self.name, 'chatresize', self.chatresize)
         config.set(self.name, 'screen', self.screenName)
-        config.set(self.name, 'enabled', '%d' % (int(self.enabled)))
-        config.set(self.name, 'title', '%d' % (int(self.showtitle)))
-        config.set(self.name, 'hideinactive', '%d' % (int(self.hideinactive)))
-        if self.url:
-            config.set(self.name, 'url', self.url)
-            if ',' in self.url:
-                self.parent.reinit()
-        with open(self.configFileName, 'w') as file:
-            config.write(file)
+        config.set(self.name, 'enabled', self.enabled)
+        config.set(self.name, 'title', self.showtitle)
+        config.set(self.name, 'hideinactive', self.hideinactive)
+        config.set(self.name, 'multiplex', self.multiplex)
+        config.set(self.name, 'renderer', self.renderer)
+        config.set(self.name, 'maxfps', self.maxfps)
+        config.set(self.name, 'animations', self.animations)
+        config.set(self.name, 'autofit', self.autofit)
+        self.parent.reconcileLater([self.name])
 
     @pyqtSlot()
     def on_click(self):
@@ -315,122 +1079,485 @@ class Overlay(QtCore.QObject):
             "document.getElementsByClassName('source-url')[0].value;", self.on_url)
 
     @pyqtSlot()
-    def skip_stream_button(self):
-        skipIntro = "buttons = document.getElementsByTagName('button');for(i=0;i<buttons.length;i++){if(buttons[i].innerHTML=='Install for OBS'){buttons[i].click()}}"
-        hideLogo = "document.getElementsByClassName('install-logo')[0].style.setProperty('display','none');"
-        resizeContents = "document.getElementsByClassName('content')[0].style.setProperty('top','30px');"
-        resizeHeader = "document.getElementsByClassName('header')[0].style.setProperty('height','35px');"
-        hidePreview = "document.getElementsByClassName('config-link')[0].style.setProperty('height','300px');document.getElementsByClassName('config-link')[0].style.setProperty('overflow','hidden');"
-        hideClose = "document.getElementsByClassName('close')[0].style.setProperty('display','none');"
+    def on_restyle(self):
+        self.runJS(
+            "document.getElementsByClassName('source-url')[0].value;", self.on_style)
+
+    def on_style(self, url):
+        # Only the style of the chosen room is taken, and every room of the
+        # section is shown with it
+        picked = ChannelList.fromUrls([url])
+        rooms = ChannelList.fromConfig(self.config, self.name)
+        if not picked or not rooms:
+            return
+        if (picked.kind, picked.guild) != (rooms.kind, rooms.guild):
+            logger.warning("%s is not a room of the same kind and server as overlay %s",
+                           url, self.name)
+            return
+        self.closeSettings()
+        self.setChannelList(rooms.withStyle(picked.style))
+        self.save()
+
+    def chooseStreamkitType(self):
         chooseVoice = "for( let button of document.getElementsByTagName('button')){ if(button.getAttribute('value') == 'voice'){ button.click(); } }"
         chooseChat = "for( let button of document.getElementsByTagName('button')){ if(button.getAttribute('value') == 'chat'){ button.click(); } }"
-        infoListener = "if(typeof console.oldlog === 'undefined'){console.oldlog=console.log;}window.consoleCatchers=[];console.log = function(text,input){if(typeof input !== 'undefined'){window.consoleCatchers.forEach(function(item,index){item(input)})}else{console.oldlog(text);}};"
-        catchGuild = "window.consoleCatchers.push(function(input){if(input.cmd == 'GET_GUILD'){window.guilds=input.data.id}})"
-        catchChannel = "window.consoleCatchers.push(function(input){if(input.cmd == 'GET_CHANNELS'){window.channels = input.data.channels;}})"
-
-        self.runJS(skipIntro)
-        self.runJS(hideLogo)
-        self.runJS(resizeContents)
-        self.runJS(hidePreview)
-        self.runJS(resizeHeader)
-        self.runJS(hideClose)
-        self.runJS(infoListener)
-        self.runJS(catchGuild)
-        self.runJS(catchChannel)
-        if self.url:
-            if 'overlay/voice' in self.url:
+        if self.channelList:
+            if self.isVoice():
                 self.runJS(chooseVoice)
             else:
                 self.runJS(chooseChat)
 
-    def enableConsoleCatcher(self):
-        if self.overlay:
-            tweak = "if(typeof console.oldlog === 'undefined'){console.oldlog=console.log;}window.consoleCatchers=[];console.log = function(text,input){if(typeof input !== 'undefined'){window.consoleCatchers.forEach(function(item,index){item(input)})}else{console.oldlog(text);}};"
-            self.overlay.page().runJavaScript(tweak)
+    def runTweak(self, js, key='bundle'):
+        # Multiplexed overlays host each room in a frame, so tweaks are
+        # relayed into every frame instead of the hosting page. Frames that
+        # load later only get the latest tweak run under each key
+        if self.isMultiplexed():
+            js = "window.runInFrames(%s, %s);" % (frameScript(js), json.dumps(key))
+        page = self.webPage()
+        if page:
+            runScript(page, js)
+
+    def evalTweak(self, js, retFunc):
+        # Returns one result per room, whether or not it is multiplexed
+        page = self.webPage()
+        if not page:
+            return
+        if self.isMultiplexed():
+            runScript(page, "window.collectFrames(%s);" % (frameScript(js, expression=True)), retFunc)
+        else:
+            runScript(page, js, lambda result: retFunc([result]))
 
-    def enableShowVoiceTitle(self):
+    def dispatcherStats(self, retFunc):
         if self.overlay:
-            tweak = "window.consoleCatchers.push(function(input){if(input.cmd == 'GET_CHANNEL'){chan=input.data.name;(function() { css = document.getElementById('title-css'); if (css == null) { css = document.createElement('style'); css.type='text/css'; css.id='title-css'; document.head.appendChild(css); } css.innerText='.voice-container:before{content:\"'+chan+'\";background:rgba(30, 33, 36, 0.95);padding:4px 6px;border-radius: 3px;}';})()}})"
-            self.overlay.page().runJavaScript(tweak)
+            self.evalTweak(
+                "window.overlayDispatcher ? window.overlayDispatcher.stats() : {}", retFunc)
 
-    def enableHideInactive(self):
-        if self.overlay and self.url:
-            if 'overlay/voice' in self.url:
-                tweak = "document.getElementById('app-mount').style='display:none';window.consoleCatchers.push(function(input){if(input.cmd=='AUTHENTICATE'){console.error(input.data.user);window.iAm=input.data.user.username;}if(input.evt=='VOICE_STATE_CREATE' || input.evt=='VOICE_STATE_UPDATE'){if(input.data.nick.toUpperCase()==window.iAm.toUpperCase()){document.getElementById('app-mount').style='display:block';console.error('Showing '+chan)}}if(input.evt=='VOICE_STATE_DELETE'){if(input.data.nick.toUpperCase()==window.iAm.toUpperCase()){document.getElementById('app-mount').style='display:none';console.error('Hiding '+chan)}}});"
-                self.overlay.page().runJavaScript(tweak)
-
-    def enableMuteDeaf(self):
-        if self.overlay:
-            tweak = "window.consoleCatchers.push(function(input){if(input.evt == 'VOICE_STATE_UPDATE'){name=input.data.nick;uState = input.data.voice_state;muteicon = '';if(uState.self_mute || uState.mute){muteicon='<img src=\\'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAABAAAAAQCAYAAAAf8/9hAAAABmJLR0QA/wD/AP+gvaeTAAAACXBIWXMAABhMAAAYJQE8CCw1AAAAB3RJTUUH5AUGCx0VMm5EjgAAABl0RVh0Q29tbWVudABDcmVhdGVkIHdpdGggR0lNUFeBDhcAAABzSURBVDjLxZIxCsAwCEW/oT1P7z93zZJjeIYMv0sCIaBoodTJDz6/JgJfBslOsns1xYONvK66JCeqAC4ALTz+dJvOo0lu/zS87p2C98IdHlq9Buo5D62h17amScMk78hBWXB/DUdP2fyBaINjJiJy4o94AM8J8ksz/MQjAAAAAElFTkSuQmCC\\' style=\\'height:0.9em;\\'>';}deaficon = '';if(uState.self_deaf || uState.deaf){deaficon='<img src=\\'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAABAAAAAQCAYAAAAf8/9hAAAABmJLR0QA/wD/AP+gvaeTAAAACXBIWXMAABhMAAAYJQE8CCw1AAAAB3RJTUUH5AUGCx077rhJQQAAABl0RVh0Q29tbWVudABDcmVhdGVkIHdpdGggR0lNUFeBDhcAAACNSURBVDjLtZPNCcAgDIUboSs4iXTGLuI2XjpBz87g4fWiENr8iNBAQPR9ef7EbfsjAEQAN4A2UtCcGtyMzFxjwVlyBHAwTRFh52gqHDVnF+6L1XJ/w31cp7YvOX/0xlOJ254qYJ1ZLTAmPWeuDVxARDurfBFR8jovMLEKWxG6c1qB55pEuQOpE8vKz30AhEdNuXK0IugAAAAASUVORK5CYII=\\' style=\\'height:0.9em;\\'>';}spans = document.getElementsByTagName('span');for(i=0;i<spans.length;i++){if(spans[i].innerHTML.startsWith(name)){text = name + muteicon + deaficon;spans[i].innerHTML = text;}}}});"
-            self.overlay.page().runJavaScript(tweak)
+    def logDispatcherStats(self, stats):
+        for frame in stats:
+            for event, stat in (frame or {}).items():
+                logger.debug("%s %s: %d handlers, %d events, %.1fms",
+                             self.name, event, stat['handlers'], stat['events'], stat['ms'])
 
     def runJS(self, string, retFunc=None):
-        if retFunc:
-            self.settingWebView.page().runJavaScript(string, retFunc)
-        else:
-            self.settingWebView.page().runJavaScript(string)
+        return runScript(self.settingWebView.page(), string, retFunc)
 
-    def applyTweaks(self):
-        self.enableConsoleCatcher()
+    def tweakOptions(self):
+        css = ''
         if self.right:
-            self.addCSS(
-                'cssrightalign', 'li.voice-state{ direction:rtl; }.avatar{ float:right !important; }.user{ display:flex; }.voice-container{margin-top:30px;}.voice-container:before{position:fixed;right:0px;top:0px;}')
-        else:
-            self.delCSS('cssrightalign')
-        if self.showtitle:
-            self.enableShowVoiceTitle()
-        if self.mutedeaf:
-            self.enableMuteDeaf()
-        if self.hideinactive:
-            self.enableHideInactive()
+            css += RIGHT_ALIGN_CSS
         if self.chatresize:
-            self.addCSS(
-                'cssflexybox', 'div.chat-container { width: 100%; height: 100%; top: 0; left: 0; position: fixed; display: flex; flex-direction: column; } div.chat-container > .messages { box-sizing: border-box; width: 100%; flex: 1; }')
+            css += CHAT_RESIZE_CSS
+        if not self.animations:
+            css += NO_ANIMATION_CSS
+        return {
+            'css': css,
+            'title': self.showtitle,
+            'mutedeaf': self.mutedeaf,
+            'hideinactive': bool(self.hideinactive and self.isVoice()),
+            'chatlimit': self.chatlimit if self.channelList and not self.isVoice() else 0,
+            'maxfps': max(0, self.maxfps),
+            'idle': max(0, self.idleafter),
+            'trace': self.config.getboolean('core', 'latency_trace', fallback=False),
+            'theme': self.theme.options(),
+            'autofit': bool(self.autofit and not self.isNative()),
+        }
+
+    def installTweaks(self):
+        # The bundle is rebuilt only when the settings behind it change, and
+        # is registered on the page so every load runs it at document creation
+        options = self.tweakOptions()
+        if options == self.tweakBundleOptions or not self.webPage():
+            return False
+        self.tweakBundleOptions = options
+        self.tweakBundle = buildTweakBundle(options)
+        installTweakBundle(self.webPage(), self.tweakBundle)
+        return True
+
+    def configureNative(self):
+        self.overlay.configure(self.rooms(), self.right, self.showtitle,
+                               self.mutedeaf, self.hideinactive)
+
+    def applyTweaks(self):
+        if isinstance(self.overlay, VoiceWidget):
+            self.configureNative()
+        if self.overlay and self.installTweaks():
+            # Bring the already loaded page up to date without a reload
+            self.runTweak(''.join(self.tweakBundle))
+            if self.tweakBundleOptions['autofit'] and self.isMultiplexed():
+                # runTweak only reaches the frames, and the hosting page
+                # measures them
+                runScript(self.webPage(), readAsset('autofit.js'))
+            self.pushRoomStates()
+            self.updateParking()
+
+    def rooms(self):
+        if not self.channelList:
+            return []
+        return list(self.channelList.channels)
+
+    def broadcast(self, js):
+        # Like runTweak, but not replayed into rooms that load later
+        if self.isMultiplexed():
+            js = "window.collectFrames(%s);" % (frameScript(js))
+        page = self.webPage()
+        if page:
+            runScript(page, js)
+
+    def on_voice_state(self, channel):
+        if self.webPage() and channel in self.rooms():
+            self.pushRoomState(channel)
+            self.updateParking()
+            if self.parked == QWebEnginePage.LifecycleState.Frozen:
+                self.thaw()
+
+    def canPark(self):
+        # The hidden page behind a native overlay is its only event source
+        return isinstance(self.overlay, QWebEngineView) and hasattr(
+            self.overlay.page(), 'setLifecycleState')
+
+    def rendererRss(self):
+        page = self.webPage()
+        if page is None or not hasattr(page, 'renderProcessPid'):
+            return None
+        return procstats.rss(page.renderProcessPid())
+
+    def park(self, state):
+        if not self.canPark() or self.parked == state:
+            return
+        # Chromium only freezes or discards pages that aren't visible
+        self.overlay.hide()
+        self.parkedRss = self.rendererRss()
+        self.webPage().setLifecycleState(state)
+        self.parked = state
+        self.lifecycle['parked'] += 1
+        if state == QWebEnginePage.LifecycleState.Frozen:
+            self.thawTimer.start()
         else:
-            self.delCSS('cssflexybox')
+            self.stopThawing()
+        QtCore.QTimer.singleShot(2000, self.measureReclaimed)
+        logger.debug("Parked %s as %s", self.name, state)
 
-    def addCSS(self, name, css):
-        if self.overlay:
-            js = '(function() { css = document.getElementById(\'%s\'); if (css == null) { css = document.createElement(\'style\'); css.type=\'text/css\'; css.id=\'%s\'; document.head.appendChild(css); } css.innerText=\'%s\';})()' % (name, name, css)
-            self.overlay.page().runJavaScript(js)
+    def measureReclaimed(self):
+        if self.parked is None or self.parkedRss is None:
+            return
+        after = self.rendererRss() or 0
+        self.lifecycle['reclaimed_bytes'] = self.parkedRss - after
+        logger.debug("Parking %s reclaimed %.1fMB", self.name,
+                     self.lifecycle['reclaimed_bytes'] / 1048576)
+
+    def wake(self):
+        if self.parked is None:
+            return
+        self.stopThawing()
+        wasDiscarded = self.parked == QWebEnginePage.LifecycleState.Discarded
+        self.parked = None
+        self.wakeTimer.start()
+        self.webPage().setLifecycleState(QWebEnginePage.LifecycleState.Active)
+        if wasDiscarded:
+            # A discarded page reloads, on_load_finished marks it awake
+            self.waking = True
+        else:
+            self.webPage().runJavaScript("1", self.woke)
+        self.moveOverlay(now=True)
+        self.overlay.show()
 
-    def delCSS(self, name):
+    def woke(self, *args):
+        self.waking = False
+        self.lifecycle['woken'] += 1
+        self.lifecycle['wake_ms'] = self.wakeTimer.elapsed()
+        logger.debug("Woke %s in %dms", self.name, self.lifecycle['wake_ms'])
+
+    def thaw(self):
+        page = self.webPage()
+        if self.parked != QWebEnginePage.LifecycleState.Frozen or page is None:
+            self.thawTimer.stop()
+            return
+        if self.thawedPage is not page:
+            self.thawedPage = page
+            page.setLifecycleState(QWebEnginePage.LifecycleState.Active)
+        # Kept thawed while its events keep coming
+        self.refreezeTimer.start()
+
+    def refreeze(self):
+        page = self.thawedPage
+        self.thawedPage = None
+        if self.parked == QWebEnginePage.LifecycleState.Frozen and page is not None \
+                and self.webPage() is page:
+            page.setLifecycleState(QWebEnginePage.LifecycleState.Frozen)
+
+    def stopThawing(self):
+        self.thawTimer.stop()
+        self.refreezeTimer.stop()
+        self.thawedPage = None
+
+    def updateParking(self):
+        # Park hide-inactive voice overlays while we're in none of their rooms
+        if not self.enabled or not self.canPark():
+            return
+        state = self.parent.voiceState
+        rooms = self.rooms()
+        if state.me is None or not all(state.knows(room) for room in rooms):
+            return
+        active = any(state.isMeIn(room) for room in rooms)
+        inactive = bool(self.hideinactive and rooms and self.isVoice() and not active)
+        if inactive and self.parked is None:
+            self.park(QWebEnginePage.LifecycleState.Frozen)
+        elif not inactive and self.parked == QWebEnginePage.LifecycleState.Frozen:
+            self.wake()
+
+    def disableOverlay(self):
+        # Keep the page around but let Chromium drop it, so enabling it
+        # again doesn't have to build a new view
+        if self.overlay and self.canPark():
+            self.park(QWebEnginePage.LifecycleState.Discarded)
+        else:
+            self.hideOverlay()
+
+    def pushRoomState(self, channel):
+        state = self.parent.voiceState
+        room = (state.channelName(channel), state.isMeIn(channel))
+        if self.roomStates.get(channel) == room:
+            return
+        self.roomStates[channel] = room
+        self.broadcast("window.overlayTweaks && window.overlayTweaks.roomState(%s, %s, %s);" % (
+            json.dumps(channel), json.dumps(room[0]), json.dumps(room[1])))
+
+    def pushRoomStates(self):
+        self.roomStates = {}
+        for channel in self.rooms():
+            self.pushRoomState(channel)
+
+    def on_load_finished(self, ok):
+        self.parent.overlayLoaded(self)
+        if self.loadClock.isValid():
+            self.loadMs = self.loadClock.elapsed()
+            self.loadClock.invalidate()
+        if isinstance(self.overlay, QWebEngineView):
+            # The page is painted by a child widget created with it
+            self.paintClock.watch(self.overlay.focusProxy())
+        if self.waking:
+            self.woke()
+        self.pushRoomStates()
+        if logger.isEnabledFor(logging.DEBUG):
+            self.evalTweak("window.overlayStyledAt", self.logStyledTime)
+            self.dispatcherStats(self.logDispatcherStats)
+            scripts = self.scriptStats()
+            logger.debug("%s ran %d scripts in %d batches, p95 %sms", self.name,
+                         scripts['scripts'], scripts['batches'], scripts['p95_ms'])
+            if self.tweakBundleOptions and self.tweakBundleOptions['chatlimit']:
+                self.statsTimer.start()
+
+    def eventCount(self):
+        return self.eventsSeen + (self.bridge.events if self.bridge else 0)
+
+    def probe(self):
+        count = self.eventCount()
+        if self.rateClock.isValid() and self.rateClock.elapsed() > 0:
+            self.eventRate = (count - self.rateEvents) * 1000.0 / self.rateClock.elapsed()
+        self.rateEvents = count
+        self.rateClock.start()
+        page = self.webPage()
+        if page is None or self.parked is not None:
+            return
+        clock = QtCore.QElapsedTimer()
+        clock.start()
+
+        def answered(result):
+            self.roundTripMs = clock.elapsed()
+        page.runJavaScript("1", answered)
+        if self.tweakBundleOptions and self.tweakBundleOptions['trace']:
+            self.evalTweak("window.overlayTracer ? window.overlayTracer.drain() : []",
+                           self.gotLatency)
+
+    def gotLatency(self, frames):
+        count = 0
+        for samples in frames:
+            for arrival, mutation, frame in samples or []:
+                self.latency['mutation'].append(mutation)
+                self.latency['frame'].append(frame)
+                count += 1
+        if count:
+            points = percentiles(self.latency['frame'])
+            logger.debug("%s voice event to frame over %d events: p50 %.1fms, p95 %.1fms, p99 %.1fms",
+                         self.name, len(self.latency['frame']), points[0.5], points[0.95], points[0.99])
+
+    def latencyQuantiles(self):
+        return dict((stage, percentiles(samples))
+                    for stage, samples in self.latency.items() if samples)
+
+    def scriptStats(self):
+        page = self.webPage()
+        return ScriptExecutor.forPage(page).stats() if page is not None else {}
+
+    def metricLabels(self):
+        return (('overlay', self.name), ('rooms', ','.join(self.rooms())))
+
+    def metrics(self):
+        page = self.webPage()
+        pid = page.renderProcessPid() if page is not None and hasattr(page, 'renderProcessPid') else None
+        since = self.paintClock.sinceMs() if self.overlay else None
+        scripts = self.scriptStats()
+        return {
+            'load_seconds': self.loadMs / 1000.0 if self.loadMs is not None else None,
+            'js_roundtrip_seconds': self.roundTripMs / 1000.0 if self.roundTripMs is not None else None,
+            'events_total': self.eventCount(),
+            'renderer_pid': pid or None,
+            'renderer_rss_bytes': procstats.rss(pid) if pid else None,
+            'seconds_since_paint': since / 1000.0 if since is not None else None,
+            'js_batch_seconds': scripts['p95_ms'] / 1000.0 if scripts.get('p95_ms') is not None else None,
+            'js_scripts_total': scripts.get('scripts'),
+        }
+
+    def chatStats(self, retFunc):
         if self.overlay:
-            js = "(function() { css = document.getElementById('%s'); if(css!=null){ css.parentNode.removeChild(css);} })()" % (
-                name)
-            self.overlay.page().runJavaScript(js)
+            self.evalTweak(
+                "window.overlayChat ? window.overlayChat.stats() : null", retFunc)
+
+    def logChatStats(self, stats):
+        for frame in stats:
+            if frame:
+                logger.debug("%s chat: %d shown, %d removed, %d batches, %.1fms reflowing",
+                             self.name, frame['messages'], frame['trimmed'],
+                             frame['batches'], frame['reflow_ms'])
+
+    def logStats(self):
+        if not self.overlay:
+            self.statsTimer.stop()
+            return
+        self.chatStats(self.logChatStats)
+
+    def logStyledTime(self, times):
+        for styledAt in times:
+            if styledAt is not None:
+                logger.debug("%s first styled paint %.1fms after load start",
+                             self.name, styledAt)
 
     @pyqtSlot()
     def toggleEnabled(self, button=None):
         self.enabled = self.enabledButton.isChecked()
-        if self.enabled:
+        if self.enabled and self.parked is not None:
+            self.wake()
+        elif self.enabled:
             self.showOverlay()
         else:
-            self.hideOverlay()
+            self.disableOverlay()
 
     @pyqtSlot()
     def toggleTitle(self, button=None):
         self.showtitle = self.showTitle.isChecked()
-        if self.showtitle:
-            self.enableShowVoiceTitle()
+        self.applyTweaks()
 
     @pyqtSlot()
     def toggleMuteDeaf(self, button=None):
         self.mutedeaf = self.muteDeaf.isChecked()
-        if self.muteDeaf.isChecked():
-            self.enableMuteDeaf()
+        self.applyTweaks()
 
     @pyqtSlot()
     def toggleHideInactive(self, button=None):
         self.hideinactive = self.hideInactive.isChecked()
-        if self.hideinactive:
-            self.enableHideInactive()
+        self.applyTweaks()
 
     @pyqtSlot()
     def toggleChatResize(self, button=None):
         self.chatresize = self.chatResize.isChecked()
         self.applyTweaks()
 
+    @pyqtSlot()
+    def toggleAnimations(self, button=None):
+        self.animations = not self.noAnimations.isChecked()
+        self.applyTweaks()
+
+    @pyqtSlot()
+    def changeMaxFps(self, value=None):
+        self.maxfps = self.maxFps.value()
+        self.applyTweaks()
+
+    def setTheme(self, theme):
+        # Every overlay of the section shares its theme, and takes it on
+        # without reloading
+        self.theme = theme
+        theme.save(self.config, self.name)
+        for overlay in self.parent.overlays:
+            if overlay.name == self.name:
+                overlay.theme = theme
+                overlay.applyTweaks()
+
+    @pyqtSlot()
+    def changeTextSize(self, value=None):
+        self.setTheme(self.theme.withValue('text_size', self.textSize.value() or None))
+
+    @pyqtSlot()
+    def changeAvatarSize(self, value=None):
+        self.setTheme(self.theme.withValue('avatar_size', self.avatarSize.value() or None))
+
+    @pyqtSlot()
+    def changeBgOpacity(self, value=None):
+        value = self.bgOpacity.value()
+        self.setTheme(self.theme.withValue(
+            'bg_opacity', '%g' % (value / 100.0) if value >= 0 else None))
+
+    @pyqtSlot()
+    def toggleLimitSpeaking(self, button=None):
+        self.setTheme(self.theme.withValue(
+            'limit_speaking', 'true' if self.limitSpeaking.isChecked() else None))
+
+    def chooseThemeColor(self, option):
+        current = QtGui.QColor(self.theme.get(option, '#ffffff'))
+        color = QtWidgets.QColorDialog.getColor(current, self.settings)
+        if color.isValid():
+            self.setTheme(self.theme.withValue(option, color.name()))
+            self.showThemeColors()
+
+    @pyqtSlot()
+    def chooseTextColor(self, button=None):
+        self.chooseThemeColor('text_color')
+
+    @pyqtSlot()
+    def chooseBgColor(self, button=None):
+        self.chooseThemeColor('bg_color')
+
+    @pyqtSlot()
+    def resetTheme(self, button=None):
+        self.setTheme(Theme())
+        self.fillThemeOptions()
+
+    def showThemeColors(self):
+        for button, option in ((self.textColor, 'text_color'), (self.bgColor, 'bg_color')):
+            color = self.theme.get(option)
+            button.setStyleSheet("background:%s;" % (color) if color else "")
+
+    def fillThemeOptions(self):
+        # Filled without each control saving the theme again
+        controls = (self.textSize, self.avatarSize, self.bgOpacity, self.limitSpeaking)
+        for control in controls:
+            control.blockSignals(True)
+        self.textSize.setValue(int(self.theme.number('text_size', 0)))
+        self.avatarSize.setValue(int(self.theme.number('avatar_size', 0)))
+        self.bgOpacity.setValue(int(round(self.theme.number('bg_opacity', -0.01) * 100)))
+        self.limitSpeaking.setChecked(self.theme.limitSpeaking())
+        for control in controls:
+            control.blockSignals(False)
+        self.showThemeColors()
+
+    @pyqtSlot()
+    def toggleAutofit(self, button=None):
+        self.autofit = self.autofitBox.isChecked()
+        self.applyTweaks()
+        self.moveOverlay()
+
+    @pyqtSlot()
+    def toggleMultiplex(self, button=None):
+        self.multiplex = self.multiplexBox.isChecked()
+
+    @pyqtSlot()
+    def toggleNative(self, button=None):
+        self.renderer = 'native' if self.nativeBox.isChecked() else 'web'
+        if self.overlay:
+            self.hideOverlay()
+            # A disabled overlay only keeps its parked page, which is dropped
+            if self.enabled:
+                self.showOverlay()
+
     @pyqtSlot()
     def toggleRightAlign(self, button=None):
         self.right = self.rightAlign.isChecked()
@@ -478,11 +1605,10 @@ class Overlay(QtCore.QObject):
 
     def populateScreenList(self):
         self.ignoreScreenComboBox = True
-        screenList = self.app.screens()
         self.settingsScreen.clear()
-        for i, s in enumerate(screenList):
-            self.settingsScreen.addItem(s.name())
-            if s.name() == self.screenName:
+        for i, name in enumerate(self.parent.screens.names()):
+            self.settingsScreen.addItem(name)
+            if name == self.screenName:
                 self.settingsScreen.setCurrentIndex(i)
 
         self.ignoreScreenComboBox = False
@@ -494,24 +1620,17 @@ class Overlay(QtCore.QObject):
             self.chooseScreen()
 
     def chooseScreen(self):
-        screen = None
-        screenList = self.app.screens()
-        logger.debug("Discovered screens: %r", [s.name() for s in screenList])
-
-        for s in screenList:
-            if s.name() == self.screenName:
-                screen = s
-                logger.debug("Chose screen %s", screen.name())
-                break
-        # The chosen screen is not in this list. Drop to primary
-        else:
-            screen = self.app.primaryScreen()
-            logger.warning(
-                "Chose screen %r as fallback because %r could not be matched", screen.name(), self.screenName)
+        screen = self.parent.screens.get(self.screenName)
+        # The chosen screen is not plugged in. Drop to primary, but keep the
+        # name so the overlay goes back once it returns
+        if screen is None:
+            screen = self.parent.screens.primary()
+            if self.screenName != 'None':
+                logger.warning(
+                    "Chose screen %r as fallback because %r could not be matched", screen.name(), self.screenName)
 
         # Fill Info!
         self.size = screen.size()
-        self.screenName = s.name()
         self.screenOffset = screen.availableGeometry()
         if self.position:
             self.settingsAspectRatio.updateScreen(
@@ -580,13 +1699,25 @@ class Overlay(QtCore.QObject):
             self.position.show()
 
     def showSettings(self):
+        user = self.parent.settingsViewUser(self)
+        if user:
+            logger.warning("Close the settings of overlay %s before opening those of %s",
+                           user.name, self.name)
+            user.settings.raise_()
+            user.settings.activateWindow()
+            return
         if self.settings is not None:
+            # Another overlay's window may have taken the browser since
+            self.settingWebView = self.parent.borrowSettingsView(self)
+            if self.settingsbox.indexOf(self.settingWebView) < 0:
+                self.settingsbox.insertWidget(0, self.settingWebView)
+            self.settingWebView.show()
             self.settings.show()
         else:
             self.settings = QtWidgets.QWidget()
             self.settings.setWindowTitle('Overlay %s Layout' % (self.name))
             self.settingsbox = QtWidgets.QVBoxLayout()
-            self.settingWebView = QWebEngineView()
+            self.settingWebView = self.parent.borrowSettingsView(self)
             self.rightAlign = QtWidgets.QCheckBox("Right Align")
             self.muteDeaf = QtWidgets.QCheckBox("Show mute and deafen")
             self.chatResize = QtWidgets.QCheckBox("Large chat box")
@@ -594,13 +1725,43 @@ class Overlay(QtCore.QObject):
             self.hideInactive = QtWidgets.QCheckBox(
                 "Hide voice channel when inactive")
             self.enabledButton = QtWidgets.QCheckBox("Enabled")
+            self.multiplexBox = QtWidgets.QCheckBox(
+                "Show all rooms in one view")
+            self.nativeBox = QtWidgets.QCheckBox(
+                "Draw voice overlay without a browser")
+            self.noAnimations = QtWidgets.QCheckBox("Disable animations")
+            self.autofitBox = QtWidgets.QCheckBox("Shrink window to its contents")
+            self.maxFps = QtWidgets.QSpinBox()
+            self.maxFps.setRange(0, 240)
+            self.maxFps.setPrefix("Max FPS: ")
+            self.maxFps.setSpecialValueText("Max FPS: unlimited")
+            self.textSize = QtWidgets.QSpinBox()
+            self.textSize.setRange(0, 72)
+            self.textSize.setPrefix("Text size: ")
+            self.textSize.setSuffix("px")
+            self.textSize.setSpecialValueText("Text size: as room style")
+            self.avatarSize = QtWidgets.QSpinBox()
+            self.avatarSize.setRange(0, 256)
+            self.avatarSize.setPrefix("Avatar size: ")
+            self.avatarSize.setSuffix("px")
+            self.avatarSize.setSpecialValueText("Avatar size: as room style")
+            self.bgOpacity = QtWidgets.QSpinBox()
+            self.bgOpacity.setRange(-1, 100)
+            self.bgOpacity.setPrefix("Background opacity: ")
+            self.bgOpacity.setSuffix("%")
+            self.bgOpacity.setSpecialValueText("Background opacity: as room style")
+            self.limitSpeaking = QtWidgets.QCheckBox("Only show who is speaking")
+            self.textColor = QtWidgets.QPushButton("Text colour")
+            self.bgColor = QtWidgets.QPushButton("Background colour")
+            self.themeReset = QtWidgets.QPushButton("Reset theme")
             self.settingTakeUrl = QtWidgets.QPushButton("Use this Room")
             self.settingTakeAllUrl = QtWidgets.QPushButton("Use all Rooms")
+            self.settingRestyle = QtWidgets.QPushButton("Use this style for every Room")
 
             self.settings.setMinimumSize(400, 400)
             self.settingTakeUrl.clicked.connect(self.on_click)
             self.settingTakeAllUrl.clicked.connect(self.getAllRooms)
-            self.settingWebView.loadFinished.connect(self.skip_stream_button)
+            self.settingRestyle.clicked.connect(self.on_restyle)
             self.rightAlign.stateChanged.connect(self.toggleRightAlign)
             self.rightAlign.setChecked(self.right)
             self.muteDeaf.stateChanged.connect(self.toggleMuteDeaf)
@@ -613,32 +1774,87 @@ class Overlay(QtCore.QObject):
             self.enabledButton.setChecked(self.enabled)
             self.chatResize.stateChanged.connect(self.toggleChatResize)
             self.chatResize.setChecked(self.chatresize)
-
-            self.settingWebView.load(QtCore.QUrl(
-                "https://streamkit.discord.com/overlay"))
+            self.multiplexBox.stateChanged.connect(self.toggleMultiplex)
+            self.multiplexBox.setChecked(self.multiplex)
+            self.nativeBox.setChecked(self.renderer == 'native')
+            self.nativeBox.stateChanged.connect(self.toggleNative)
+            self.noAnimations.setChecked(not self.animations)
+            self.noAnimations.stateChanged.connect(self.toggleAnimations)
+            self.autofitBox.setChecked(self.autofit)
+            self.autofitBox.stateChanged.connect(self.toggleAutofit)
+            self.maxFps.setValue(self.maxfps)
+            self.maxFps.valueChanged.connect(self.changeMaxFps)
+            self.fillThemeOptions()
+            self.textSize.valueChanged.connect(self.changeTextSize)
+            self.avatarSize.valueChanged.connect(self.changeAvatarSize)
+            self.bgOpacity.valueChanged.connect(self.changeBgOpacity)
+            self.limitSpeaking.stateChanged.connect(self.toggleLimitSpeaking)
+            self.textColor.clicked.connect(self.chooseTextColor)
+            self.bgColor.clicked.connect(self.chooseBgColor)
+            self.themeReset.clicked.connect(self.resetTheme)
 
             self.settingsbox.addWidget(self.settingWebView)
+            self.settingWebView.show()
             self.settingsbox.addWidget(self.rightAlign)
             self.settingsbox.addWidget(self.muteDeaf)
             self.settingsbox.addWidget(self.chatResize)
             self.settingsbox.addWidget(self.showTitle)
             self.settingsbox.addWidget(self.hideInactive)
             self.settingsbox.addWidget(self.enabledButton)
+            self.settingsbox.addWidget(self.multiplexBox)
+            self.settingsbox.addWidget(self.nativeBox)
+            self.settingsbox.addWidget(self.noAnimations)
+            self.settingsbox.addWidget(self.autofitBox)
+            self.settingsbox.addWidget(self.maxFps)
+            self.settingsbox.addWidget(self.textSize)
+            self.settingsbox.addWidget(self.avatarSize)
+            self.settingsbox.addWidget(self.bgOpacity)
+            self.settingsbox.addWidget(self.limitSpeaking)
+            self.settingsbox.addWidget(self.textColor)
+            self.settingsbox.addWidget(self.bgColor)
+            self.settingsbox.addWidget(self.themeReset)
             self.settingsbox.addWidget(self.settingTakeUrl)
             self.settingsbox.addWidget(self.settingTakeAllUrl)
+            self.settingsbox.addWidget(self.settingRestyle)
             self.settings.setLayout(self.settingsbox)
             self.settings.show()
 
     def screenShot(self, screen):
-        screenshot = screen.grabWindow(0)
-        self.settingsPreview.setImage(screenshot)
+        self.settingsPreview.setImage(self.parent.previews.get(screen))
         self.settingsPreview.setContentsMargins(0, 0, 0, 0)
 
+    def setupPage(self, page):
+        self.tweakBundleOptions = None
+        # Streamkit payloads are streamed into the shared voice state
+        self.bridge = StreamkitBridge(self.parent.voiceState, self.parent.recorder)
+        self.bridge.resourcesLoaded.connect(self.parent.countResources)
+        self.bridge.contentBounds.connect(self.gotBounds)
+        self.contentBounds = None
+        self.webChannel = QWebChannel(page)
+        self.webChannel.registerObject('bridge', self.bridge)
+        page.setWebChannel(self.webChannel)
+        page.loadFinished.connect(self.on_load_finished)
+
     def showOverlay(self):
         if self.overlay:
             return
-        self.overlay = QWebEngineView()
-        self.overlay.page().setBackgroundColor(QtCore.Qt.transparent)
+        loadWebEngine()
+        if self.isNative():
+            if self.feedFile:
+                # A recording's rooms and user aren't the real ones, so they
+                # are kept out of the state every other overlay parks by
+                state = VoiceState()
+                self.overlay = VoiceWidget(state)
+                self.feed = RecordedFeed(state, os.path.expanduser(self.feedFile), loop=True)
+            else:
+                self.overlay = VoiceWidget(self.parent.voiceState)
+                self.feed = StreamkitFeed(self.parent.voiceState, self.parent.newPage())
+                self.setupPage(self.feed.page)
+        else:
+            self.overlay = QWebEngineView()
+            self.overlay.setPage(self.parent.newPage(self.overlay))
+            self.overlay.page().setBackgroundColor(QtCore.Qt.transparent)
+            self.setupPage(self.overlay.page())
         self.overlay.setAttribute(QtCore.Qt.WA_TranslucentBackground, True)
         self.overlay.setAttribute(QtCore.Qt.WA_TransparentForMouseEvents, True)
         self.overlay.setWindowFlags(
@@ -651,45 +1867,61 @@ class Overlay(QtCore.QObject):
             QtCore.Qt.WindowSystemMenuHint |
             QtCore.Qt.WindowMinimizeButtonHint
         )
-        self.overlay.loadFinished.connect(self.applyTweaks)
-        self.overlay.load(QtCore.QUrl(self.url))
+        self.installTweaks()
+        self.loadUrl()
+        if self.feed:
+            self.feed.start()
 
         self.overlay.setStyleSheet("background:transparent;")
+        self.paintClock.watch(self.overlay)
+        self.moveOverlay(now=True)
         self.overlay.show()
-        self.moveOverlay()
 
     def hideOverlay(self):
+        self.stopThawing()
+        self.parked = None
         if self.overlay:
+            self.parent.geometry.cancel(self.overlay)
             self.overlay.close()
             self.overlay = None
+            self.paintClock.forget()
+            if self.feed:
+                self.feed.stop()
+                self.feed = None
+            if self.bridge:
+                self.eventsSeen += self.bridge.events
+            self.webChannel = None
+            self.bridge = None
 
     def delete(self):
+        try:
+            self.parent.voiceState.changed.disconnect(self.on_voice_state)
+        except TypeError:
+            # Already deleted
+            pass
         self.hideOverlay()
         if self.settings:
-            self.settings.close()
+            self.closeSettings()
         if self.position:
             self.position.close()
         self.overlay = None
 
     def getAllRooms(self):
-        getChannel = "[window.channels, window.guilds]"
+        getChannel = "[window.channels, window.guilds, (document.getElementsByClassName('source-url')[0] || {}).value]"
         self.runJS(getChannel, self.gotAllRooms)
 
     def gotAllRooms(self, message):
-        sep = ''
-        url = ''
-        for chan in message[0]:
-            if chan['type'] == 2:
-                url += sep+"https://streamkit.discord.com/overlay/voice/%s/%s?icon=true&online=true&logo=white&text_color=%%23ffffff&text_size=14&text_outline_color=%%23000000&text_outline_size=0&text_shadow_color=%%23000000&text_shadow_size=0&bg_color=%%231e2124&bg_opacity=0.95&bg_shadow_color=%%23000000&bg_shadow_size=0&limit_speaking=false&small_avatars=false&hide_names=false&fade_chat=0" % (message[1], chan[
-                    'id'])
-                sep = ','
-
-        if self.overlay:
-            self.overlay.load(QtCore.QUrl(url))
-        self.url = url
+        channels = [chan['id'] for chan in message[0] if chan['type'] == 2]
+        # Styled as chosen in streamkit, or failing that as the rooms the
+        # overlay already had
+        picked = ChannelList.fromUrls([message[2]]) if message[2] else None
+        if picked and picked.isVoice():
+            style = picked.style
+        else:
+            style = self.channelList.style if self.isVoice() else VOICE_STYLE
+        self.closeSettings()
+        self.setChannelList(ChannelList('voice', message[1], channels, style))
         self.save()
-        self.settings.close()
-        self.settings = None
 
 
 def entrypoint():
@@ -705,5 +1937,7 @@ def entrypoint():
         a.main()
         app.exec()
 
+    # Lets QtWebEngine be imported after the QApplication exists
+    QtCore.QCoreApplication.setAttribute(QtCore.Qt.AA_ShareOpenGLContexts)
     app = QtWidgets.QApplication(sys.argv)
     main(app)
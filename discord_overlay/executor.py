@@ -0,0 +1,136 @@
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# Every runJavaScript call is a round trip to the renderer process. Scripts
+# queued on a page's executor during one turn of the event loop are sent
+# together as a single evaluation, and each gets a Future for its result.
+import logging
+import collections
+from concurrent.futures import Future
+from PyQt5 import QtCore
+from .metrics import percentiles
+
+logger = logging.getLogger(__name__)
+
+# Batches whose latency is kept for the stats
+BATCH_SAMPLES = 1000
+# The batch is one function with every script inlined in its own try, so
+# one that throws doesn't stop the rest. Nothing is compiled with eval, as a
+# page's content security policy may forbid it while runJavaScript itself
+# isn't held to it. Scripts run as statements unless their value is wanted,
+# and var declarations stay in the batch rather than becoming globals
+BATCH_JS = "(function() {\nvar __dolResults = [];\n%s\nreturn __dolResults;\n})();"
+STATEMENT_JS = "try {\n%s\n;__dolResults.push([true, null]);\n} catch (e) {\n__dolResults.push([false, String(e)]);\n}"
+EXPRESSION_JS = "try {\n__dolResults.push([true, (%s\n)]);\n} catch (e) {\n__dolResults.push([false, String(e)]);\n}"
+
+
+def inline(js, expression):
+    if expression:
+        return EXPRESSION_JS % (js.strip().rstrip(';'))
+    return STATEMENT_JS % (js)
+
+
+class ScriptError(Exception):
+    pass
+
+
+class ScriptExecutor(QtCore.QObject):
+
+    def __init__(self, page):
+        super().__init__(page)
+        self.page = page
+        self.queued = []
+        self.inFlight = {}
+        self.batches = 0
+        self.scripts = 0
+        self.latency = collections.deque(maxlen=BATCH_SAMPLES)
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(0)
+        self.timer.timeout.connect(self.flush)
+        page.destroyed.connect(self.cancel)
+
+    @classmethod
+    def forPage(cls, page):
+        executor = page.findChild(cls)
+        if executor is None:
+            executor = cls(page)
+        return executor
+
+    def run(self, js, expression=False):
+        future = Future()
+        future.set_running_or_notify_cancel()
+        self.queued.append((inline(js, expression), future))
+        if not self.timer.isActive():
+            self.timer.start()
+        return future
+
+    def flush(self):
+        batch = self.queued
+        self.queued = []
+        if not batch:
+            return
+        self.inFlight[id(batch)] = batch
+        clock = QtCore.QElapsedTimer()
+        clock.start()
+        self.page.runJavaScript(
+            BATCH_JS % ('\n'.join(js for js, future in batch)),
+            lambda results: self.finished(batch, clock.elapsed(), results))
+
+    def finished(self, batch, ms, results):
+        self.inFlight.pop(id(batch), None)
+        self.batches += 1
+        self.scripts += len(batch)
+        self.latency.append(ms)
+        if not isinstance(results, list) or len(results) != len(batch):
+            # A script that doesn't parse fails its whole batch
+            results = [(False, "Batch didn't run")] * len(batch)
+        for (js, future), (ok, value) in zip(batch, results):
+            if future.done():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(ScriptError(value))
+
+    def cancel(self, *args):
+        # The page is gone, nothing queued or sent will be answered
+        self.timer.stop()
+        for batch in [self.queued] + list(self.inFlight.values()):
+            for js, future in batch:
+                if not future.done():
+                    future.set_exception(ScriptError("Page closed"))
+        self.queued = []
+        self.inFlight = {}
+
+    def stats(self):
+        points = percentiles(self.latency)
+        return {
+            'batches': self.batches,
+            'scripts': self.scripts,
+            'p50_ms': points.get(0.5),
+            'p95_ms': points.get(0.95),
+        }
+
+
+def runScript(page, js, retFunc=None):
+    # Fire and forget, or have retFunc called with the result if the script
+    # ran without throwing. Scripts whose result is wanted are expressions
+    future = ScriptExecutor.forPage(page).run(js, expression=retFunc is not None)
+
+    def done(future):
+        if future.exception() is not None:
+            logger.debug("Script failed: %s", future.exception())
+        elif retFunc:
+            retFunc(future.result())
+    future.add_done_callback(done)
+    return future
@@ -0,0 +1,167 @@
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# Per-overlay performance figures in the Prometheus text format, served on
+# loopback when [core] metrics_port is set:
+#
+#   curl http://127.0.0.1:<port>/metrics
+import logging
+from PyQt5 import QtCore, QtNetwork
+from . import procstats
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'discord_overlay_'
+# Name, type and help of every per-overlay metric, see Overlay.metrics
+OVERLAY_METRICS = (
+    ('load_seconds', 'gauge', "Time the last page load of the overlay took"),
+    ('js_roundtrip_seconds', 'gauge', "Round trip of a trivial runJavaScript call"),
+    ('events_total', 'counter', "Streamkit events the overlay received"),
+    ('renderer_pid', 'gauge', "Process id of the overlay's renderer"),
+    ('renderer_rss_bytes', 'gauge', "Resident memory of the overlay's renderer"),
+    ('seconds_since_paint', 'gauge', "Time since the overlay window last painted"),
+    ('js_batch_seconds', 'gauge', "95th percentile round trip of a batch of scripts"),
+    ('js_scripts_total', 'counter', "Scripts run on the overlay's page through its executor"),
+)
+
+
+class PaintClock(QtCore.QObject):
+    # Event filter noting when the widgets it watches last painted
+
+    def __init__(self):
+        super().__init__()
+        self.clock = QtCore.QElapsedTimer()
+        self.watched = set()
+
+    def watch(self, widget):
+        if widget is not None and id(widget) not in self.watched:
+            key = id(widget)
+            self.watched.add(key)
+            widget.installEventFilter(self)
+            # Its id may be reused by a later widget once it is gone
+            widget.destroyed.connect(lambda *args: self.watched.discard(key))
+
+    def forget(self):
+        self.watched = set()
+
+    def eventFilter(self, obj, event):
+        if event.type() in (QtCore.QEvent.Paint, QtCore.QEvent.UpdateRequest):
+            self.clock.start()
+        return False
+
+    def sinceMs(self):
+        return self.clock.elapsed() if self.clock.isValid() else None
+
+
+def percentiles(samples, points=(0.5, 0.95, 0.99)):
+    # Nearest rank, which is plenty for a few thousand samples
+    ordered = sorted(samples)
+    if not ordered:
+        return {}
+    return dict((point, ordered[min(len(ordered) - 1, int(point * len(ordered)))])
+                for point in points)
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus(app):
+    lines = []
+    samples = [(overlay.metricLabels(), overlay.metrics()) for overlay in app.overlays]
+    for name, kind, text in OVERLAY_METRICS:
+        lines.append('# HELP %s%s %s' % (PREFIX, name, text))
+        lines.append('# TYPE %s%s %s' % (PREFIX, name, kind))
+        for labels, values in samples:
+            if values.get(name) is None:
+                continue
+            label = ','.join('%s="%s"' % (key, escape(value)) for key, value in labels)
+            lines.append('%s%s{%s} %s' % (PREFIX, name, label, values[name]))
+    # Only there while latency_trace is on
+    traced = [(overlay.metricLabels(), overlay.latencyQuantiles()) for overlay in app.overlays]
+    if any(quantiles for labels, quantiles in traced):
+        lines.append('# HELP %svoice_latency_seconds Time from a voice event arriving to the DOM '
+                     'changing, and to the next frame' % (PREFIX))
+        lines.append('# TYPE %svoice_latency_seconds summary' % (PREFIX))
+        for labels, quantiles in traced:
+            for stage, points in sorted(quantiles.items()):
+                for point, ms in sorted(points.items()):
+                    label = ','.join('%s="%s"' % (key, escape(value)) for key, value in
+                                     labels + (('stage', stage), ('quantile', point)))
+                    lines.append('%svoice_latency_seconds{%s} %.4f' % (PREFIX, label, ms / 1000.0))
+    tree = procstats.tree()
+    lines.extend([
+        '# HELP %sprocess_tree_rss_bytes Resident memory of the app and its QtWebEngine processes' % (PREFIX),
+        '# TYPE %sprocess_tree_rss_bytes gauge' % (PREFIX),
+        '%sprocess_tree_rss_bytes %d' % (PREFIX, tree['rss']),
+        '# HELP %sprocess_tree_cpu_seconds_total CPU time of the app and its QtWebEngine processes' % (PREFIX),
+        '# TYPE %sprocess_tree_cpu_seconds_total counter' % (PREFIX),
+        '%sprocess_tree_cpu_seconds_total %.2f' % (PREFIX, tree['cpu']),
+        '# HELP %shttp_cache_hits_total Resources the shared HTTP cache served' % (PREFIX),
+        '# TYPE %shttp_cache_hits_total counter' % (PREFIX),
+        '%shttp_cache_hits_total %d' % (PREFIX, app.resourceStats['cached']),
+        '# HELP %shttp_resources_total Resources the overlays fetched' % (PREFIX),
+        '# TYPE %shttp_resources_total counter' % (PREFIX),
+        '%shttp_resources_total %d' % (PREFIX, app.resourceStats['total']),
+    ])
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsServer(QtNetwork.QTcpServer):
+    # Just enough HTTP for a scraper, on the Qt event loop so the figures
+    # can be read without locking
+
+    def __init__(self, app):
+        super().__init__()
+        self.app = app
+        self.requests = {}
+        self.newConnection.connect(self.accept)
+
+    def start(self, port):
+        if not self.listen(QtNetwork.QHostAddress(QtNetwork.QHostAddress.LocalHost), port):
+            logger.error("Unable to serve metrics on port %d: %s", port, self.errorString())
+            return False
+        logger.info("Serving metrics on http://127.0.0.1:%d/metrics", self.serverPort())
+        return True
+
+    def accept(self):
+        while self.hasPendingConnections():
+            socket = self.nextPendingConnection()
+            self.requests[socket] = b''
+            socket.readyRead.connect(lambda socket=socket: self.read(socket))
+            socket.disconnected.connect(lambda socket=socket: self.drop(socket))
+
+    def drop(self, socket):
+        self.requests.pop(socket, None)
+        socket.deleteLater()
+
+    def read(self, socket):
+        data = self.requests.get(socket, b'') + bytes(socket.readAll())
+        self.requests[socket] = data
+        if b'\r\n\r\n' not in data and b'\n\n' not in data:
+            if len(data) > 8192:
+                socket.abort()
+            return
+        request = data.split(b'\n', 1)[0].split()
+        path = request[1].split(b'?', 1)[0] if len(request) > 1 else b''
+        if request and request[0] == b'GET' and path in (b'/', b'/metrics'):
+            self.reply(socket, '200 OK', prometheus(self.app))
+        else:
+            self.reply(socket, '404 Not Found', 'Not found\n')
+
+    def reply(self, socket, status, body):
+        body = body.encode('utf-8')
+        socket.write(('HTTP/1.0 %s\r\n'
+                      'Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+                      'Content-Length: %d\r\n'
+                      'Connection: close\r\n\r\n' % (status, len(body))).encode('ascii') + body)
+        socket.disconnectFromHost()
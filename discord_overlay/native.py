@@ -0,0 +1,238 @@
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import os
+import json
+import logging
+from PyQt5 import QtWidgets, QtGui, QtCore, QtNetwork
+
+logger = logging.getLogger(__name__)
+
+AVATAR_URL = "https://cdn.discordapp.com/avatars/%s/%s.png?size=64"
+
+
+class EventFeed(QtCore.QObject):
+    # A source of streamkit payloads. Every payload is applied to the
+    # shared voice state and re-emitted for anyone else listening
+    received = QtCore.pyqtSignal(str, dict)
+
+    def __init__(self, state):
+        super().__init__()
+        self.state = state
+
+    def deliver(self, channel, payload):
+        self.state.handle(channel, payload)
+        self.received.emit(channel, payload)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class StreamkitFeed(EventFeed):
+    # Payloads from a streamkit page that is loaded but never shown. The
+    # page's bridge already writes into the voice state
+    def __init__(self, state, page):
+        super().__init__(state)
+        self.page = page
+
+    def stop(self):
+        self.page.deleteLater()
+        self.page = None
+
+
+class RecordedFeed(EventFeed):
+    # Replays a JSONL recording, one {"t", "channel", "payload"} object per
+    # line with t in seconds. A speed of 0 replays as fast as possible
+    def __init__(self, state, fileName, speed=1.0, loop=False):
+        super().__init__(state)
+        self.fileName = fileName
+        self.speed = speed
+        self.loop = loop
+        self.events = []
+        self.position = 0
+        self.clock = QtCore.QElapsedTimer()
+        self.offset = 0.0
+        self.timer = QtCore.QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.next)
+
+    def read(self):
+        events = []
+        with open(self.fileName, 'r') as file:
+            for line in file:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    event = json.loads(line)
+                    events.append((float(event['t']), str(event['channel']), event['payload']))
+                except (ValueError, KeyError) as exc:
+                    logger.warning("Skipping bad line in %s: %s", self.fileName, exc)
+        events.sort(key=lambda event: event[0])
+        return events
+
+    def start(self):
+        try:
+            self.events = self.read()
+        except OSError as exc:
+            logger.error("Unable to read recording %s: %s", self.fileName, exc)
+            return
+        self.position = 0
+        self.offset = self.events[0][0] if self.events else 0.0
+        self.clock.start()
+        self.schedule()
+
+    def stop(self):
+        self.timer.stop()
+
+    def schedule(self):
+        if self.position >= len(self.events):
+            if self.loop and self.events:
+                self.position = 0
+                self.clock.start()
+            else:
+                return
+        if self.speed <= 0:
+            self.timer.start(0)
+            return
+        due = (self.events[self.position][0] - self.offset) / self.speed
+        self.timer.start(max(0, int(due * 1000) - self.clock.elapsed()))
+
+    def next(self):
+        elapsed = self.clock.elapsed() / 1000.0
+        # Deliver everything that is due, so slow frames don't drift
+        while self.position < len(self.events):
+            t, channel, payload = self.events[self.position]
+            if self.speed > 0 and (t - self.offset) / self.speed > elapsed:
+                break
+            self.deliver(channel, payload)
+            self.position += 1
+            if self.speed <= 0:
+                break
+        self.schedule()
+
+
+class VoiceWidget(QtWidgets.QWidget):
+    # Paints the members of one or more voice channels directly, for when
+    # a whole browser per overlay is more than the machine can spare
+    def __init__(self, state):
+        super().__init__()
+        self.state = state
+        self.rooms = []
+        self.right = False
+        self.showtitle = True
+        self.mutedeaf = True
+        self.hideinactive = True
+        self.avatars = {}
+        self.network = QtNetwork.QNetworkAccessManager(self)
+        self.network.finished.connect(self.avatarFetched)
+        directory = os.path.join(os.path.dirname(__file__), 'web')
+        self.muteIcon = QtGui.QPixmap(os.path.join(directory, 'mute.png'))
+        self.deafIcon = QtGui.QPixmap(os.path.join(directory, 'deaf.png'))
+        self.labelFont = QtGui.QFont()
+        self.labelFont.setPixelSize(14)
+        self.state.changed.connect(self.stateChanged)
+
+    def configure(self, rooms, right, showtitle, mutedeaf, hideinactive):
+        self.rooms = rooms
+        self.right = right
+        self.showtitle = showtitle
+        self.mutedeaf = mutedeaf
+        self.hideinactive = hideinactive
+        self.update()
+
+    def stateChanged(self, channel):
+        if channel in self.rooms:
+            self.update()
+
+    def avatar(self, user):
+        key = (user['id'], user.get('avatar'))
+        if key not in self.avatars:
+            self.avatars[key] = None
+            if user.get('avatar'):
+                request = QtNetwork.QNetworkRequest(
+                    QtCore.QUrl(AVATAR_URL % (user['id'], user['avatar'])))
+                request.setAttribute(QtNetwork.QNetworkRequest.User, key)
+                self.network.get(request)
+        return self.avatars[key]
+
+    def avatarFetched(self, reply):
+        key = reply.request().attribute(QtNetwork.QNetworkRequest.User)
+        image = QtGui.QPixmap()
+        if reply.error() == QtNetwork.QNetworkReply.NoError and image.loadFromData(reply.readAll()):
+            self.avatars[key] = image
+            self.update()
+        reply.deleteLater()
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter(self)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        painter.setFont(self.labelFont)
+        metrics = QtGui.QFontMetrics(self.labelFont)
+        background = QtGui.QColor(30, 33, 36, 242)
+        size = 30
+        y = 0
+        for channel in self.rooms:
+            if self.hideinactive and not self.state.isMeIn(channel):
+                continue
+            members = sorted(self.state.members(channel),
+                             key=lambda user: (user['nick'] or '').upper())
+            if not members:
+                continue
+            if self.showtitle and self.state.channelName(channel):
+                y = self.paintLabel(painter, metrics, background,
+                                    self.state.channelName(channel), 0, y, [])
+            for user in members:
+                icons = []
+                if self.mutedeaf and user['mute']:
+                    icons.append(self.muteIcon)
+                if self.mutedeaf and user['deaf']:
+                    icons.append(self.deafIcon)
+                x = self.width() - size if self.right else 0
+                avatar = QtCore.QRectF(x, y, size, size)
+                path = QtGui.QPainterPath()
+                path.addEllipse(avatar)
+                image = self.avatar(user)
+                if image:
+                    painter.save()
+                    painter.setClipPath(path)
+                    painter.drawPixmap(avatar.toRect(), image)
+                    painter.restore()
+                else:
+                    painter.fillPath(path, QtGui.QColor(114, 137, 218))
+                if user['speaking']:
+                    painter.setPen(QtGui.QPen(QtGui.QColor(67, 181, 129), 2))
+                    painter.drawEllipse(avatar.adjusted(1, 1, -1, -1))
+                self.paintLabel(painter, metrics, background, user['nick'] or '',
+                                size + 8, y + 3, icons)
+                y += size + 8
+        painter.end()
+
+    def paintLabel(self, painter, metrics, background, text, indent, y, icons):
+        iconSize = metrics.height()
+        width = metrics.horizontalAdvance(text) + 12 + len(icons) * iconSize
+        height = metrics.height() + 8
+        x = self.width() - indent - width if self.right else indent
+        painter.setPen(QtCore.Qt.NoPen)
+        painter.setBrush(background)
+        painter.drawRoundedRect(QtCore.QRectF(x, y, width, height), 3, 3)
+        painter.setPen(QtGui.QColor(255, 255, 255))
+        painter.drawText(QtCore.QRectF(x + 6, y + 4, width, metrics.height()),
+                         QtCore.Qt.AlignLeft | QtCore.Qt.AlignVCenter, text)
+        iconX = x + 6 + metrics.horizontalAdvance(text)
+        for icon in icons:
+            painter.drawPixmap(QtCore.QRect(int(iconX), int(y + 4), iconSize, iconSize), icon)
+            iconX += iconSize
+        return y + height + 8
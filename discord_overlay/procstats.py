@@ -0,0 +1,79 @@
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# Memory and CPU figures for this process and the QtWebEngine processes
+# it spawns, read straight from /proc. Everything returns None or 0 when
+# a process has gone away or /proc is unavailable.
+import os
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def rss(pid):
+    # Resident set size in bytes
+    try:
+        with open('/proc/%d/statm' % (pid), 'r') as file:
+            return int(file.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def stat(pid):
+    try:
+        with open('/proc/%d/stat' % (pid), 'r') as file:
+            # The command name may contain spaces, so split after it
+            return file.read().rsplit(')', 1)[1].split()
+    except (OSError, IndexError):
+        return None
+
+
+def cpuTime(pid):
+    # User plus system CPU time in seconds
+    fields = stat(pid)
+    if not fields:
+        return 0.0
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+def parent(pid):
+    fields = stat(pid)
+    return int(fields[1]) if fields else None
+
+
+def descendants(pid):
+    children = {}
+    try:
+        pids = [int(entry) for entry in os.listdir('/proc') if entry.isdigit()]
+    except OSError:
+        return []
+    for child in pids:
+        children.setdefault(parent(child), []).append(child)
+    found = []
+    pending = [pid]
+    while pending:
+        for child in children.get(pending.pop(), []):
+            found.append(child)
+            pending.append(child)
+    return found
+
+
+def tree(pid=None):
+    # Combined RSS and CPU time of a process and everything below it
+    if pid is None:
+        pid = os.getpid()
+    pids = [pid] + descendants(pid)
+    return {
+        'processes': len(pids),
+        'rss': sum(rss(p) or 0 for p in pids),
+        'cpu': sum(cpuTime(p) for p in pids),
+    }
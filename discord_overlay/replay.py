@@ -0,0 +1,174 @@
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# Recording and replaying streamkit sessions, so busy channels can be
+# reproduced without Discord or a network.
+#
+# Recordings are JSONL, one {"t", "channel", "payload"} object per line
+# with t in seconds from the start of the recording. The replay server
+# serves a stand-in for the streamkit voice widget at the same paths as
+# streamkit, which plays a recording back itself:
+#
+#   http://127.0.0.1:8765/overlay/voice/<guild>/<channel>?speed=10
+#
+# A speed of 0 plays the recording as fast as possible. Adding
+# &channel=<id> only plays the events recorded for that channel.
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+logger = logging.getLogger(__name__)
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'web', 'fixture-voice.html')
+
+
+class EventRecorder(object):
+    # Appends every payload the overlays see to a recording
+
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.file = open(fileName, 'a')
+        self.start = time.monotonic()
+        self.count = 0
+        logger.info("Recording streamkit events to %s", fileName)
+
+    @classmethod
+    def fromEnvironment(cls):
+        fileName = os.environ.get('DISCORD_OVERLAY_RECORD')
+        if not fileName:
+            return None
+        try:
+            return cls(os.path.expanduser(fileName))
+        except OSError as exc:
+            logger.error("Can't record to %s: %s", fileName, exc)
+            return None
+
+    def record(self, channel, payload):
+        self.file.write(json.dumps({
+            't': round(time.monotonic() - self.start, 4),
+            'channel': channel,
+            'payload': payload,
+        }) + '\n')
+        self.count += 1
+        # Keep the file usable if we're killed mid-session
+        if self.count % 50 == 0:
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def syntheticRecording(fileName, members=20, seconds=30, rate=10, channel='1'):
+    # A voice channel of the given size with someone starting or stopping
+    # speaking `rate` times a second
+    random.seed(members)
+    events = [(0.0, {'cmd': 'AUTHENTICATE', 'data': {'user': {'id': '0', 'username': 'User 0'}}})]
+    events.append((0.0, {'cmd': 'GET_CHANNEL', 'data': {'id': channel, 'name': 'Benchmark', 'voice_states': [
+        {'nick': 'User %d' % (i), 'user': {'id': str(i), 'username': 'User %d' % (i)},
+         'voice_state': {'mute': False, 'deaf': False, 'self_mute': False, 'self_deaf': False}}
+        for i in range(members)]}}))
+    speaking = set()
+    for tick in range(int(seconds * rate)):
+        user = str(random.randrange(members))
+        event = 'SPEAKING_STOP' if user in speaking else 'SPEAKING_START'
+        speaking.symmetric_difference_update([user])
+        events.append((tick / rate, {'cmd': 'DISPATCH', 'evt': event,
+                                     'data': {'user_id': user, 'channel_id': channel}}))
+    with open(fileName, 'w') as file:
+        for t, payload in events:
+            file.write(json.dumps({'t': t, 'channel': channel, 'payload': payload}) + '\n')
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path == '/recording.jsonl':
+            self.send(self.server.recording, 'application/x-ndjson')
+        elif path.startswith('/overlay/'):
+            self.send(FIXTURE, 'text/html')
+        else:
+            self.send_error(404)
+
+    def send(self, fileName, contentType):
+        try:
+            with open(fileName, 'rb') as file:
+                body = file.read()
+        except OSError:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', contentType)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+class ReplayServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, recording, port=0):
+        super().__init__(('127.0.0.1', port), ReplayHandler)
+        self.recording = recording
+        self.thread = None
+
+    def url(self, guild='1', channel='1', speed=1):
+        return "http://127.0.0.1:%d/overlay/voice/%s/%s?speed=%s" % (
+            self.server_address[1], guild, channel, speed)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve a recorded streamkit session for overlays to load")
+    parser.add_argument('recording', help="JSONL recording to play back")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--speed', default='1',
+                        help="playback speed, 0 for as fast as possible")
+    parser.add_argument('--synthesise', type=int, metavar='MEMBERS',
+                        help="write a synthetic recording of a channel this size first")
+    parser.add_argument('--seconds', type=float, default=60,
+                        help="length of a synthetic recording")
+    args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)-15s %(levelname)-8s %(message)s',
+                        level=logging.INFO)
+
+    if args.synthesise:
+        syntheticRecording(args.recording, members=args.synthesise, seconds=args.seconds)
+    server = ReplayServer(args.recording, args.port)
+    print("Point an overlay url at %s" % (server.url(speed=args.speed)))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,131 @@
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# Display options that are applied to a running page as CSS custom
+# properties, so restyling an overlay doesn't reload streamkit. They are
+# stored in the overlay's section as a query string like the room style,
+# and anything left unset is drawn as that style asks.
+import re
+from urllib.parse import parse_qsl, urlencode
+
+COLOR = re.compile(r'^#[0-9a-fA-F]{6}$')
+
+
+def color(value):
+    return value if COLOR.match(value) else None
+
+
+def rgb(value):
+    if not COLOR.match(value):
+        return None
+    return ', '.join(str(int(value[i:i + 2], 16)) for i in (1, 3, 5))
+
+
+def pixels(value):
+    try:
+        size = int(value)
+    except ValueError:
+        return None
+    return '%dpx' % (size) if size > 0 else None
+
+
+def opacity(value):
+    try:
+        return '%g' % (min(1.0, max(0.0, float(value))))
+    except ValueError:
+        return None
+
+
+# Option, the custom property it sets and how its value is written
+THEME_OPTIONS = (
+    ('text_color', '--dol-text-color', color),
+    ('text_size', '--dol-text-size', pixels),
+    ('bg_color', '--dol-bg-rgb', rgb),
+    ('bg_opacity', '--dol-bg-opacity', opacity),
+    ('avatar_size', '--dol-avatar-size', pixels),
+    ('limit_speaking', None, None),
+)
+# Rules added once any of their properties is set. The fallbacks are the
+# colours of the default voice style
+THEME_RULES = (
+    (('--dol-text-color',),
+     '.voice-state .name, .message .username, .message .content { color: var(--dol-text-color) !important; }'),
+    (('--dol-text-size',),
+     '.voice-state .name, .message .username, .message .content { font-size: var(--dol-text-size) !important; }'),
+    (('--dol-bg-rgb', '--dol-bg-opacity'),
+     '.voice-state .name, .messages .message { background-color: rgba(var(--dol-bg-rgb, 30, 33, 36), var(--dol-bg-opacity, 0.95)) !important; }'),
+    (('--dol-avatar-size',),
+     '.voice-state .avatar { width: var(--dol-avatar-size) !important; height: var(--dol-avatar-size) !important; }'),
+)
+LIMIT_SPEAKING_CSS = 'html.dol-limitspeaking li.voice-state:not(.dol-speaking) { display: none; }'
+
+
+class Theme(object):
+
+    def __init__(self, values=None):
+        known = [option for option, prop, write in THEME_OPTIONS]
+        self.values = dict((key, value) for key, value in (values or {}).items()
+                           if key in known and value not in (None, ''))
+
+    def __eq__(self, other):
+        return isinstance(other, Theme) and self.values == other.values
+
+    def __repr__(self):
+        return "Theme(%r)" % (self.values)
+
+    @classmethod
+    def fromConfig(cls, config, section):
+        return cls(dict(parse_qsl(config.get(section, 'theme', fallback=''))))
+
+    def save(self, config, section):
+        if self.values:
+            config.set(section, 'theme', self.query())
+        else:
+            config.remove(section, 'theme')
+
+    def query(self):
+        return urlencode(sorted(self.values.items()))
+
+    def get(self, option, fallback=None):
+        return self.values.get(option, fallback)
+
+    def number(self, option, fallback=None):
+        try:
+            return float(self.values[option])
+        except (KeyError, ValueError):
+            return fallback
+
+    def withValue(self, option, value):
+        values = dict(self.values)
+        values[option] = None if value is None else str(value)
+        return Theme(values)
+
+    def variables(self):
+        variables = {}
+        for option, prop, write in THEME_OPTIONS:
+            if prop and option in self.values:
+                value = write(self.values[option])
+                if value is not None:
+                    variables[prop] = value
+        return variables
+
+    def limitSpeaking(self):
+        return self.values.get('limit_speaking') == 'true'
+
+    def options(self):
+        # What tweaks.js hands to overlayTheme.apply
+        variables = self.variables()
+        css = ''.join(rule for props, rule in THEME_RULES
+                      if any(prop in variables for prop in props))
+        if self.limitSpeaking():
+            css += LIMIT_SPEAKING_CSS
+        return {'vars': variables, 'css': css, 'limitspeaking': self.limitSpeaking()}
@@ -0,0 +1,128 @@
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import json
+import logging
+from PyQt5 import QtCore
+from PyQt5.QtCore import pyqtSlot
+
+logger = logging.getLogger(__name__)
+
+
+class VoiceState(QtCore.QObject):
+    # Who is in which voice channel, built from the streamkit payloads of
+    # every overlay. Users are keyed by id and channels by channel id
+    changed = QtCore.pyqtSignal(str)
+
+    def __init__(self):
+        super().__init__()
+        self.me = None
+        self.users = {}
+        self.channels = {}
+
+    def channel(self, channelId):
+        channel = self.channels.get(channelId)
+        if channel is None:
+            channel = {'name': None, 'members': set()}
+            self.channels[channelId] = channel
+        return channel
+
+    def updateUser(self, channelId, data):
+        user = data['user']
+        voice = data.get('voice_state', {})
+        entry = self.users.setdefault(user['id'], {'speaking': False})
+        entry.update({
+            'id': user['id'],
+            'username': user.get('username'),
+            'nick': data.get('nick') or user.get('username'),
+            'avatar': user.get('avatar'),
+            'mute': bool(voice.get('mute') or voice.get('self_mute')),
+            'deaf': bool(voice.get('deaf') or voice.get('self_deaf')),
+        })
+        self.channel(channelId)['members'].add(user['id'])
+
+    def handle(self, channelId, payload):
+        data = payload.get('data') or {}
+        event = payload.get('evt') or payload.get('cmd')
+        if event == 'AUTHENTICATE':
+            self.me = data['user']['id']
+        elif event == 'GET_CHANNEL':
+            channelId = data.get('id', channelId)
+            channel = self.channel(channelId)
+            channel['name'] = data.get('name')
+            channel['members'] = set()
+            for voiceState in data.get('voice_states', []):
+                self.updateUser(channelId, voiceState)
+        elif event in ('VOICE_STATE_CREATE', 'VOICE_STATE_UPDATE'):
+            self.updateUser(channelId, data)
+        elif event == 'VOICE_STATE_DELETE':
+            self.channel(channelId)['members'].discard(data['user']['id'])
+        elif event in ('SPEAKING_START', 'SPEAKING_STOP'):
+            user = self.users.get(data.get('user_id'))
+            if user is None:
+                return
+            user['speaking'] = event == 'SPEAKING_START'
+        else:
+            return
+        self.changed.emit(channelId)
+
+    def knows(self, channelId):
+        return channelId in self.channels
+
+    def channelName(self, channelId):
+        channel = self.channels.get(channelId)
+        return channel['name'] if channel else None
+
+    def members(self, channelId):
+        channel = self.channels.get(channelId)
+        if not channel:
+            return []
+        return [self.users[userId] for userId in channel['members']]
+
+    def isMeIn(self, channelId):
+        channel = self.channels.get(channelId)
+        return bool(channel and self.me in channel['members'])
+
+
+class StreamkitBridge(QtCore.QObject):
+    # Exposed to overlay pages over QWebChannel as 'bridge'
+    resourcesLoaded = QtCore.pyqtSignal(int, int)
+    contentBounds = QtCore.pyqtSignal(int, list)
+
+    def __init__(self, state, recorder=None):
+        super().__init__()
+        self.state = state
+        self.recorder = recorder
+        self.events = 0
+
+    @pyqtSlot(str, str)
+    def streamkitEvent(self, channelId, payload):
+        self.events += 1
+        try:
+            payload = json.loads(payload)
+            if self.recorder:
+                self.recorder.record(channelId, payload)
+            self.state.handle(channelId, payload)
+        except (ValueError, KeyError, TypeError) as exc:
+            logger.warning("Unable to handle streamkit payload: %s", exc)
+
+    @pyqtSlot(int, int)
+    def resources(self, cached, total):
+        # Resources fetched since the last report, and how many of them the
+        # HTTP cache served
+        self.resourcesLoaded.emit(cached, total)
+
+    @pyqtSlot(int, 'QVariantList')
+    def bounds(self, width, rects):
+        # What the page draws, as [x, y, width, height] in a viewport that
+        # was width wide
+        self.contentBounds.emit(width, rects)
@@ -0,0 +1,118 @@
+// Reports what an overlay actually draws, so its window can be shrunk to
+// that and shaped around it instead of compositing the whole box. Users
+// and messages are measured whenever one is added or removed, or a
+// ResizeObserver sees one change size. Names don't wrap, so a window
+// narrowed to its names still measures a longer one in full. Rooms in the
+// frames of a multiplexed overlay leave the reporting to the hosting page,
+// which measures them where their frames sit.
+(function() {
+    if (typeof window.overlayFit !== 'undefined') {
+        return;
+    }
+    var ITEMS = '.voice-state .avatar, .voice-state .name, .messages .message';
+    var DELAY = 100;
+    var timer = null;
+    var last = '';
+
+    var framed = window.top !== window;
+
+    function host() {
+        // The hosting page may get its own copy after the frames
+        try {
+            return window.top.overlayFit || null;
+        } catch (e) {
+            return null;
+        }
+    }
+
+    var resizes = new ResizeObserver(function() { fit.schedule(); });
+
+    var fit = {
+        // [x, y, width, height] of everything drawn, in this document
+        rects: function() {
+            var rects = [];
+            var top = Infinity;
+            var left = Infinity;
+            var right = -Infinity;
+            function add(x, y, width, height) {
+                if (width > 0 && height > 0) {
+                    rects.push([Math.floor(x), Math.floor(y), Math.ceil(width), Math.ceil(height)]);
+                    top = Math.min(top, y);
+                    left = Math.min(left, x);
+                    right = Math.max(right, x + width);
+                }
+            }
+            document.querySelectorAll(ITEMS).forEach(function(item) {
+                resizes.observe(item);
+                var rect = item.getBoundingClientRect();
+                add(rect.left, rect.top, rect.width, rect.height);
+            });
+            document.querySelectorAll('iframe').forEach(function(frame) {
+                var inner = null;
+                try {
+                    inner = frame.contentWindow.overlayFit;
+                } catch (e) {
+                    inner = null;
+                }
+                var at = frame.getBoundingClientRect();
+                if (inner && at.width > 0 && at.height > 0) {
+                    inner.rects().forEach(function(rect) {
+                        add(at.left + rect[0], at.top + rect[1], rect[2], rect[3]);
+                    });
+                }
+            });
+            // The room title is a pseudo-element above the users, which
+            // can't be measured
+            if (rects.length && top > 0 && window.overlayTweaks && window.overlayTweaks.options.title) {
+                add(left, 0, right - left, top);
+            }
+            return rects;
+        },
+
+        schedule: function() {
+            if (framed) {
+                if (host()) {
+                    host().schedule();
+                }
+                return;
+            }
+            if (timer === null) {
+                timer = setTimeout(fit.report, DELAY);
+            }
+        },
+
+        report: function() {
+            timer = null;
+            if (!window.overlayBridge) {
+                return;
+            }
+            var target = window.overlayBridge.target;
+            if (!target || !target.bounds) {
+                // The web channel is still connecting
+                fit.schedule();
+                return;
+            }
+            var rects = fit.rects();
+            var report = JSON.stringify([window.innerWidth, rects]);
+            if (report !== last) {
+                last = report;
+                target.bounds(window.innerWidth, rects);
+            }
+        },
+
+        wake: function() {
+            last = '';
+            fit.schedule();
+        }
+    };
+
+    var style = document.createElement('style');
+    style.id = 'overlay-fit-css';
+    style.textContent = '.voice-state .name { white-space: nowrap; }';
+    (document.head || document.documentElement).appendChild(style);
+    new MutationObserver(fit.schedule).observe(document.documentElement, {childList: true, subtree: true});
+    resizes.observe(document.documentElement);
+    window.addEventListener('resize', fit.schedule);
+    window.overlayFit = fit;
+    fit.schedule();
+})();
@@ -0,0 +1,90 @@
+// Streams every streamkit payload to the Python side over QWebChannel.
+// Rooms hosted in frames of a multiplexed overlay hand their payloads to
+// the hosting page, which owns the only channel.
+(function() {
+    if (typeof window.overlayBridge !== 'undefined') {
+        return;
+    }
+    var match = location.pathname.match(/\/overlay\/\w+\/\d+\/(\d+)/);
+    var room = match ? match[1] : '';
+    var bridge = {
+        target: null,
+        queue: [],
+
+        send: function(channel, payload) {
+            if (bridge.target) {
+                bridge.target.streamkitEvent(channel, payload);
+            } else {
+                bridge.queue.push([channel, payload]);
+            }
+        },
+
+        // Resources fetched since the last report and how many of them came
+        // from the HTTP cache. Cross-origin entries without timing access
+        // report no sizes at all and are left out
+        fetched: {cached: 0, total: 0},
+        reportTimer: null,
+
+        countResources: function(cached, total) {
+            bridge.fetched.cached += cached;
+            bridge.fetched.total += total;
+            if (bridge.reportTimer === null) {
+                bridge.reportTimer = setTimeout(bridge.reportResources, 1000);
+            }
+        },
+
+        reportResources: function() {
+            bridge.reportTimer = null;
+            if (!bridge.target) {
+                bridge.reportTimer = setTimeout(bridge.reportResources, 1000);
+                return;
+            }
+            if (bridge.fetched.total > 0) {
+                bridge.target.resources(bridge.fetched.cached, bridge.fetched.total);
+            }
+            bridge.fetched = {cached: 0, total: 0};
+        }
+    };
+
+    var host = null;
+    try {
+        if (window.top !== window && window.top.overlayBridge) {
+            host = window.top.overlayBridge;
+        }
+    } catch (e) {
+        host = null;
+    }
+    if (host) {
+        bridge.target = {streamkitEvent: host.send, resources: host.countResources};
+    } else if (typeof qt !== 'undefined' && typeof QWebChannel !== 'undefined') {
+        new QWebChannel(qt.webChannelTransport, function(channel) {
+            bridge.target = channel.objects.bridge;
+            bridge.queue.forEach(function(item) { bridge.target.streamkitEvent(item[0], item[1]); });
+            bridge.queue = [];
+        });
+    } else {
+        return;
+    }
+
+    window.overlayDispatcher.register('bridge', '*', function(input) {
+        bridge.send(room, JSON.stringify(input));
+    });
+    if (typeof PerformanceObserver !== 'undefined') {
+        new PerformanceObserver(function(list) {
+            var cached = 0;
+            var total = 0;
+            list.getEntries().forEach(function(entry) {
+                if (entry.decodedBodySize > 0) {
+                    total++;
+                    if (entry.transferSize === 0) {
+                        cached++;
+                    }
+                }
+            });
+            if (total > 0) {
+                bridge.countResources(cached, total);
+            }
+        }).observe({type: 'resource', buffered: true});
+    }
+    window.overlayBridge = bridge;
+})();
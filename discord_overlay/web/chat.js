@@ -0,0 +1,136 @@
+// Keeps a chat overlay to the newest overlayTweaks.options.chatlimit
+// messages. Streamkit never drops a message with fade_chat=0, so older ones
+// are removed from the page, keeping its DOM and memory bounded over a long
+// session. React still thinks it owns the removed nodes, so the list's own
+// removeChild and insertBefore are taught to let those go quietly.
+// New messages are held back and shown together once per animation frame,
+// so a burst of messages costs a single reflow.
+(function() {
+    if (typeof window.overlayChat !== 'undefined') {
+        return;
+    }
+    var LIST = 'div.chat-container > .messages';
+    var list = null;
+    var pending = [];
+    var scheduled = false;
+    var removed = new WeakSet();
+
+    function limit() {
+        var options = window.overlayTweaks ? window.overlayTweaks.options : {};
+        return options.chatlimit || 0;
+    }
+
+    var style = document.createElement('style');
+    style.id = 'overlay-chat-css';
+    style.textContent = '.dol-pending { display: none !important; }';
+    (document.head || document.documentElement).appendChild(style);
+
+    var chat = {
+        batches: 0,
+        reflowMs: 0,
+        trimmed: 0,
+
+        // Called again by overlayTweaks.configure when the limit changes
+        configure: function() {
+            schedule();
+        },
+
+        stats: function() {
+            return {
+                trimmed: chat.trimmed,
+                batches: chat.batches,
+                reflow_ms: chat.reflowMs,
+                messages: list ? list.childElementCount : 0
+            };
+        }
+    };
+
+    function schedule() {
+        if (!scheduled) {
+            scheduled = true;
+            requestAnimationFrame(commit);
+        }
+    }
+
+    function trim() {
+        var max = limit();
+        if (max <= 0) {
+            return;
+        }
+        while (list.childElementCount > max) {
+            var node = list.firstElementChild;
+            removed.add(node);
+            node.remove();
+            chat.trimmed++;
+        }
+    }
+
+    function commit() {
+        scheduled = false;
+        if (!list) {
+            return;
+        }
+        var start = performance.now();
+        pending.forEach(function(node) {
+            node.classList.remove('dol-pending');
+        });
+        pending = [];
+        trim();
+        // Reading layout flushes the reflow this batch caused
+        void list.offsetHeight;
+        chat.reflowMs += performance.now() - start;
+        chat.batches++;
+    }
+
+    function added(mutations) {
+        var batching = limit() > 0;
+        mutations.forEach(function(mutation) {
+            mutation.addedNodes.forEach(function(node) {
+                if (node.nodeType === Node.ELEMENT_NODE && batching) {
+                    node.classList.add('dol-pending');
+                    pending.push(node);
+                }
+            });
+        });
+        schedule();
+    }
+
+    function adopt(found) {
+        // React unmounting or inserting around a message that was trimmed
+        // would otherwise throw and take the whole overlay down
+        var removeChild = found.removeChild;
+        var insertBefore = found.insertBefore;
+        found.removeChild = function(node) {
+            if (removed.has(node) && node.parentNode !== found) {
+                return node;
+            }
+            return removeChild.call(found, node);
+        };
+        found.insertBefore = function(node, before) {
+            if (before && removed.has(before) && before.parentNode !== found) {
+                before = found.firstChild;
+            }
+            return insertBefore.call(found, node, before);
+        };
+        list = found;
+        new MutationObserver(added).observe(list, {childList: true});
+        schedule();
+    }
+
+    // Streamkit renders the message list some time after the page loads.
+    // The page is only watched until then
+    var watcher = new MutationObserver(attach);
+
+    function attach() {
+        var found = document.querySelector(LIST);
+        if (!found) {
+            return;
+        }
+        watcher.disconnect();
+        adopt(found);
+    }
+
+    watcher.observe(document.documentElement, {childList: true, subtree: true});
+    attach();
+    window.overlayChat = chat;
+})();
@@ -0,0 +1,103 @@
+// Routes the streamkit payloads that are passed to console.log to the
+// handlers registered for them. Each feature registers under its own key,
+// so enabling a feature twice replaces its handler rather than stacking a
+// second copy. Installing the dispatcher again is a no-op.
+(function() {
+    if (typeof window.overlayDispatcher !== 'undefined') {
+        return;
+    }
+    if (typeof console.oldlog === 'undefined') {
+        console.oldlog = console.log;
+    }
+
+    var features = new Map();
+    var routes = new Map();
+    var timings = new Map();
+
+    function route(type) {
+        var handlers = routes.get(type);
+        if (!handlers) {
+            handlers = new Map();
+            routes.set(type, handlers);
+        }
+        return handlers;
+    }
+
+    var dispatcher = {
+        // types is a list of cmd/evt names, or '*' for every payload
+        register: function(key, types, handler) {
+            dispatcher.unregister(key);
+            if (!Array.isArray(types)) {
+                types = [types];
+            }
+            features.set(key, types);
+            types.forEach(function(type) { route(type).set(key, handler); });
+        },
+
+        unregister: function(key) {
+            var types = features.get(key);
+            if (!types) {
+                return;
+            }
+            types.forEach(function(type) {
+                var handlers = routes.get(type);
+                handlers.delete(key);
+                if (handlers.size === 0) {
+                    routes.delete(type);
+                }
+            });
+            features.delete(key);
+        },
+
+        dispatch: function(input) {
+            var type = input.evt || input.cmd;
+            var timing = timings.get(type);
+            if (!timing) {
+                timing = {events: 0, ms: 0};
+                timings.set(type, timing);
+            }
+            var start = performance.now();
+            [routes.get(type), routes.get('*')].forEach(function(handlers) {
+                if (!handlers) {
+                    return;
+                }
+                handlers.forEach(function(handler, key) {
+                    try {
+                        handler(input);
+                    } catch (e) {
+                        console.error('Handler ' + key + ' failed on ' + type + ': ' + e);
+                    }
+                });
+            });
+            timing.events++;
+            timing.ms += performance.now() - start;
+        },
+
+        stats: function() {
+            var stats = {};
+            timings.forEach(function(timing, type) {
+                var handlers = routes.get(type);
+                stats[type] = {
+                    handlers: handlers ? handlers.size : 0,
+                    events: timing.events,
+                    ms: timing.ms
+                };
+            });
+            routes.forEach(function(handlers, type) {
+                if (!stats[type]) {
+                    stats[type] = {handlers: handlers.size, events: 0, ms: 0};
+                }
+            });
+            return stats;
+        }
+    };
+
+    console.log = function(text, input) {
+        if (typeof input !== 'undefined') {
+            dispatcher.dispatch(input);
+        } else {
+            console.oldlog.apply(console, arguments);
+        }
+    };
+    window.overlayDispatcher = dispatcher;
+})();
@@ -0,0 +1,153 @@
+// Render budget for an overlay. requestAnimationFrame callbacks are held
+// to overlayTweaks.options.maxfps. CSS animations and transitions run at
+// the display rate on their own, so under a cap they are paused and moved
+// on by hand once per capped frame. Once no streamkit event has come in
+// for options.idle seconds CSS animations are paused and frames are held
+// back entirely until the next event, so a quiet overlay stops repainting.
+(function() {
+    if (typeof window.overlayFrames !== 'undefined') {
+        return;
+    }
+    var nativeRequest = window.requestAnimationFrame.bind(window);
+    var callbacks = new Map();
+    var nextId = 1;
+    var waiting = false;
+    var last = 0;
+    var idleTimer = null;
+    // CSS animations paused to be stepped under the cap
+    var held = new Set();
+    var stepTimer = null;
+    var lastStep = 0;
+
+    function options() {
+        return window.overlayTweaks ? window.overlayTweaks.options : {};
+    }
+
+    function flush(now) {
+        waiting = false;
+        last = now;
+        frames.frames++;
+        var due = callbacks;
+        callbacks = new Map();
+        due.forEach(function(callback) {
+            try {
+                callback(now);
+            } catch (e) {
+                setTimeout(function() { throw e; });
+            }
+        });
+    }
+
+    function schedule() {
+        if (waiting || frames.idle || callbacks.size === 0) {
+            return;
+        }
+        waiting = true;
+        var fps = options().maxfps || 0;
+        var delay = fps > 0 ? last + 1000 / fps - performance.now() : 0;
+        if (delay > 1) {
+            setTimeout(function() { nativeRequest(flush); }, delay);
+        } else {
+            nativeRequest(flush);
+        }
+    }
+
+    function stepAnimations() {
+        stepTimer = null;
+        var fps = options().maxfps || 0;
+        if (fps <= 0 || typeof document.getAnimations !== 'function') {
+            release();
+            return;
+        }
+        if (frames.idle) {
+            // Woken with the next event
+            lastStep = 0;
+            return;
+        }
+        var now = performance.now();
+        var elapsed = lastStep ? now - lastStep : 0;
+        lastStep = now;
+        document.getAnimations().forEach(function(animation) {
+            if (animation.playState === 'running') {
+                animation.pause();
+                held.add(animation);
+            } else if (held.has(animation) && animation.playState === 'paused') {
+                var end = animation.effect ? animation.effect.getComputedTiming().endTime : Infinity;
+                var time = (animation.currentTime || 0) + elapsed * animation.playbackRate;
+                if (time >= end) {
+                    held.delete(animation);
+                    animation.finish();
+                } else {
+                    animation.currentTime = time;
+                }
+            }
+        });
+        held.forEach(function(animation) {
+            if (animation.playState !== 'paused') {
+                held.delete(animation);
+            }
+        });
+        frames.steps++;
+        stepTimer = setTimeout(stepAnimations, 1000 / fps);
+    }
+
+    function release() {
+        held.forEach(function(animation) {
+            if (animation.playState === 'paused') {
+                animation.play();
+            }
+        });
+        held.clear();
+        lastStep = 0;
+    }
+
+    function sleep() {
+        frames.idle = true;
+        frames.sleeps++;
+        document.documentElement.classList.add('dol-idle');
+    }
+
+    var frames = {
+        idle: false,
+        frames: 0,
+        sleeps: 0,
+        steps: 0,
+
+        wake: function() {
+            if (frames.idle) {
+                frames.idle = false;
+                document.documentElement.classList.remove('dol-idle');
+                schedule();
+            }
+            if (stepTimer === null) {
+                stepAnimations();
+            }
+            clearTimeout(idleTimer);
+            var idle = options().idle || 0;
+            if (idle > 0) {
+                idleTimer = setTimeout(sleep, idle * 1000);
+            }
+        },
+
+        stats: function() {
+            return {idle: frames.idle, frames: frames.frames, sleeps: frames.sleeps, steps: frames.steps};
+        }
+    };
+
+    window.requestAnimationFrame = function(callback) {
+        var id = nextId++;
+        callbacks.set(id, callback);
+        schedule();
+        return id;
+    };
+    window.cancelAnimationFrame = function(id) {
+        callbacks.delete(id);
+    };
+
+    var style = document.createElement('style');
+    style.id = 'overlay-idle-css';
+    style.textContent = 'html.dol-idle *, html.dol-idle *::before, html.dol-idle *::after { animation-play-state: paused !important; transition: none !important; }';
+    (document.head || document.documentElement).appendChild(style);
+    window.overlayDispatcher.register('frames', '*', frames.wake);
+    window.overlayFrames = frames;
+})();
@@ -0,0 +1,118 @@
+// Mute and deafen indicators for the voice overlay.
+// Name elements are indexed by nickname as streamkit renders them, so an
+// update touches only the affected user. The icons live in one shared
+// stylesheet and are toggled with classes instead of rewriting markup.
+(function() {
+    if (typeof window.voiceIndex === 'undefined') {
+        var index = {
+            names: new Map(),
+            states: new Map(),
+
+            key: function(span) {
+                return span.textContent.trim().toUpperCase();
+            },
+
+            apply: function(span, state) {
+                span.classList.toggle('dol-muted', state.mute);
+                span.classList.toggle('dol-deaf', state.deaf);
+            },
+
+            add: function(span) {
+                var key = index.key(span);
+                var spans = index.names.get(key);
+                if (!spans) {
+                    spans = new Set();
+                    index.names.set(key, spans);
+                }
+                spans.add(span);
+                span.dataset.dolName = key;
+                var state = index.states.get(key);
+                if (state) {
+                    index.apply(span, state);
+                }
+            },
+
+            remove: function(span) {
+                var spans = index.names.get(span.dataset.dolName);
+                if (spans) {
+                    spans.delete(span);
+                    if (spans.size === 0) {
+                        index.names.delete(span.dataset.dolName);
+                    }
+                }
+            },
+
+            // A span whose text changed, as on a rename
+            rename: function(span) {
+                if (span.dataset.dolName === index.key(span)) {
+                    return;
+                }
+                index.remove(span);
+                span.classList.remove('dol-muted', 'dol-deaf');
+                index.add(span);
+            },
+
+            // Forgets every state, for when the indicators are turned off
+            clear: function() {
+                index.states.clear();
+                index.names.forEach(function(spans) {
+                    spans.forEach(function(span) {
+                        span.classList.remove('dol-muted', 'dol-deaf');
+                    });
+                });
+            },
+
+            scan: function(node, callback) {
+                if (node.nodeType !== Node.ELEMENT_NODE) {
+                    return;
+                }
+                if (node.matches('li.voice-state span')) {
+                    callback(node);
+                }
+                node.querySelectorAll('li.voice-state span').forEach(callback);
+            },
+
+            update: function(input) {
+                if (input.evt !== 'VOICE_STATE_UPDATE' && input.evt !== 'VOICE_STATE_CREATE') {
+                    return;
+                }
+                var voice = input.data.voice_state;
+                var key = input.data.nick.toUpperCase();
+                var state = {
+                    mute: !!(voice.self_mute || voice.mute),
+                    deaf: !!(voice.self_deaf || voice.deaf)
+                };
+                index.states.set(key, state);
+                var spans = index.names.get(key);
+                if (spans) {
+                    spans.forEach(function(span) { index.apply(span, state); });
+                }
+            }
+        };
+
+        var css = document.createElement('style');
+        css.type = 'text/css';
+        css.id = 'mutedeaf-css';
+        css.innerText = '.dol-muted::after, .dol-deaf::after { content: ""; display: inline-block; height: 0.9em; width: 0.9em; background-repeat: no-repeat; background-size: 0.9em 0.9em; }' +
+            '.dol-muted::after { background-image: url(data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAABAAAAAQCAYAAAAf8/9hAAAABmJLR0QA/wD/AP+gvaeTAAAACXBIWXMAABhMAAAYJQE8CCw1AAAAB3RJTUUH5AUGCx0VMm5EjgAAABl0RVh0Q29tbWVudABDcmVhdGVkIHdpdGggR0lNUFeBDhcAAABzSURBVDjLxZIxCsAwCEW/oT1P7z93zZJjeIYMv0sCIaBoodTJDz6/JgJfBslOsns1xYONvK66JCeqAC4ALTz+dJvOo0lu/zS87p2C98IdHlq9Buo5D62h17amScMk78hBWXB/DUdP2fyBaINjJiJy4o94AM8J8ksz/MQjAAAAAElFTkSuQmCC); }' +
+            '.dol-deaf::after { background-image: url(data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAABAAAAAQCAYAAAAf8/9hAAAABmJLR0QA/wD/AP+gvaeTAAAACXBIWXMAABhMAAAYJQE8CCw1AAAAB3RJTUUH5AUGCx077rhJQQAAABl0RVh0Q29tbWVudABDcmVhdGVkIHdpdGggR0lNUFeBDhcAAACNSURBVDjLtZPNCcAgDIUboSs4iXTGLuI2XjpBz87g4fWiENr8iNBAQPR9ef7EbfsjAEQAN4A2UtCcGtyMzFxjwVlyBHAwTRFh52gqHDVnF+6L1XJ/w31cp7YvOX/0xlOJ254qYJ1ZLTAmPWeuDVxARDurfBFR8jovMLEKWxG6c1qB55pEuQOpE8vKz30AhEdNuXK0IugAAAAASUVORK5CYII=); }' +
+            '.dol-muted.dol-deaf::after { width: 1.8em; background-image: url(data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAABAAAAAQCAYAAAAf8/9hAAAABmJLR0QA/wD/AP+gvaeTAAAACXBIWXMAABhMAAAYJQE8CCw1AAAAB3RJTUUH5AUGCx0VMm5EjgAAABl0RVh0Q29tbWVudABDcmVhdGVkIHdpdGggR0lNUFeBDhcAAABzSURBVDjLxZIxCsAwCEW/oT1P7z93zZJjeIYMv0sCIaBoodTJDz6/JgJfBslOsns1xYONvK66JCeqAC4ALTz+dJvOo0lu/zS87p2C98IdHlq9Buo5D62h17amScMk78hBWXB/DUdP2fyBaINjJiJy4o94AM8J8ksz/MQjAAAAAElFTkSuQmCC), url(data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAABAAAAAQCAYAAAAf8/9hAAAABmJLR0QA/wD/AP+gvaeTAAAACXBIWXMAABhMAAAYJQE8CCw1AAAAB3RJTUUH5AUGCx077rhJQQAAABl0RVh0Q29tbWVudABDcmVhdGVkIHdpdGggR0lNUFeBDhcAAACNSURBVDjLtZPNCcAgDIUboSs4iXTGLuI2XjpBz87g4fWiENr8iNBAQPR9ef7EbfsjAEQAN4A2UtCcGtyMzFxjwVlyBHAwTRFh52gqHDVnF+6L1XJ/w31cp7YvOX/0xlOJ254qYJ1ZLTAmPWeuDVxARDurfBFR8jovMLEKWxG6c1qB55pEuQOpE8vKz30AhEdNuXK0IugAAAAASUVORK5CYII=); background-position: left, right; }';
+        document.head.appendChild(css);
+
+        index.scan(document.body, index.add);
+        new MutationObserver(function(mutations) {
+            mutations.forEach(function(mutation) {
+                var target = mutation.type === 'characterData' ? mutation.target.parentElement : mutation.target;
+                mutation.removedNodes.forEach(function(node) { index.scan(node, index.remove); });
+                mutation.addedNodes.forEach(function(node) { index.scan(node, index.add); });
+                if (target && target.dataset && target.dataset.dolName !== undefined) {
+                    index.rename(target);
+                }
+            });
+        }).observe(document.body, {childList: true, subtree: true, characterData: true});
+
+        window.voiceIndex = index;
+    }
+    window.overlayDispatcher.register(
+        'mutedeaf', ['VOICE_STATE_CREATE', 'VOICE_STATE_UPDATE'], window.voiceIndex.update);
+})();
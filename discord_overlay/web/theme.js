@@ -0,0 +1,76 @@
+// Theme of an overlay, see theme.py. Values are custom properties on the
+// root element and only the rules for options that are set are added, so
+// restyling a live page is a style recalculation rather than a reload.
+// Streamkit marks speaking on the avatar, so limiting the overlay to
+// speakers copies that up to the avatar's row where CSS can hide it.
+(function() {
+    if (typeof window.overlayTheme !== 'undefined') {
+        return;
+    }
+    var applied = [];
+    var limiting = false;
+
+    function mark(avatar) {
+        var row = avatar.closest('li.voice-state');
+        if (row) {
+            row.classList.toggle('dol-speaking', avatar.classList.contains('speaking'));
+        }
+    }
+
+    var observer = new MutationObserver(function(mutations) {
+        mutations.forEach(function(mutation) {
+            if (mutation.type === 'attributes') {
+                if (mutation.target.matches('.avatar')) {
+                    mark(mutation.target);
+                }
+                return;
+            }
+            mutation.addedNodes.forEach(function(node) {
+                if (node.nodeType !== Node.ELEMENT_NODE) {
+                    return;
+                }
+                if (node.matches('li.voice-state .avatar')) {
+                    mark(node);
+                }
+                node.querySelectorAll('li.voice-state .avatar').forEach(mark);
+            });
+        });
+    });
+
+    window.overlayTheme = {
+        apply: function(theme) {
+            var root = document.documentElement;
+            var vars = theme.vars || {};
+            applied.forEach(function(name) {
+                if (!(name in vars)) {
+                    root.style.removeProperty(name);
+                }
+            });
+            applied = Object.keys(vars);
+            applied.forEach(function(name) {
+                root.style.setProperty(name, vars[name]);
+            });
+
+            var style = document.getElementById('overlay-theme');
+            if (style == null) {
+                style = document.createElement('style');
+                style.type = 'text/css';
+                style.id = 'overlay-theme';
+                (document.head || document.documentElement).appendChild(style);
+            }
+            if (style.textContent !== (theme.css || '')) {
+                style.textContent = theme.css || '';
+            }
+
+            var limit = !!theme.limitspeaking;
+            root.classList.toggle('dol-limitspeaking', limit);
+            if (limit && !limiting) {
+                observer.observe(root, {childList: true, subtree: true, attributes: true, attributeFilter: ['class']});
+                document.querySelectorAll('li.voice-state .avatar').forEach(mark);
+            } else if (!limit && limiting) {
+                observer.disconnect();
+            }
+            limiting = limit;
+        }
+    };
+})();
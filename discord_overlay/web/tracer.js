@@ -0,0 +1,94 @@
+// Opt-in latency tracer. Every voice event is stamped when streamkit
+// logs it, at the first DOM mutation after that and at the animation
+// frame following the mutation, which is when the speaking ring can reach
+// the screen. The Python side drains the samples and aggregates them.
+(function() {
+    if (typeof window.overlayTracer !== 'undefined') {
+        return;
+    }
+    var TRACED = ['VOICE_STATE_UPDATE', 'SPEAKING_START', 'SPEAKING_STOP'];
+    var LIMIT = 5000;
+    var STALE = 1000;
+    var arrived = [];
+    var mutated = [];
+    var samples = [];
+    var framePending = false;
+    var OUR_STYLES = /^(overlay-|mutedeaf-css$|title-css$)/;
+
+    function ourStyle(node) {
+        return node && node.nodeType === Node.ELEMENT_NODE && node.nodeName === 'STYLE' &&
+            OUR_STYLES.test(node.id);
+    }
+
+    function otherClasses(value) {
+        return (value || '').split(/\s+/).filter(function(name) {
+            return name && name.indexOf('dol-') !== 0;
+        }).sort().join(' ');
+    }
+
+    // Changes the tweaks make themselves, often in the same dispatch as
+    // the event, aren't streamkit drawing it
+    function ours(record) {
+        if (record.type === 'attributes') {
+            var name = record.attributeName;
+            if (name === 'class') {
+                return otherClasses(record.oldValue) === otherClasses(record.target.getAttribute('class'));
+            }
+            return name.indexOf('data-dol-') === 0 ||
+                (name === 'style' && record.target === document.documentElement);
+        }
+        if (record.type === 'characterData') {
+            return ourStyle(record.target.parentNode);
+        }
+        if (ourStyle(record.target)) {
+            return true;
+        }
+        var nodes = Array.prototype.slice.call(record.addedNodes).concat(
+            Array.prototype.slice.call(record.removedNodes));
+        return nodes.length > 0 && nodes.every(ourStyle);
+    }
+
+    function frame(now) {
+        framePending = false;
+        var done = mutated;
+        mutated = [];
+        done.forEach(function(event) {
+            if (samples.length < LIMIT) {
+                samples.push([event[0], event[1] - event[0], now - event[0]]);
+            }
+        });
+    }
+
+    new MutationObserver(function(records) {
+        if (arrived.length === 0 || records.every(ours)) {
+            return;
+        }
+        var now = performance.now();
+        arrived.forEach(function(at) {
+            // An event that changed nothing on screen isn't charged for a
+            // later, unrelated mutation
+            if (now - at < STALE) {
+                mutated.push([at, now]);
+            }
+        });
+        arrived = [];
+        if (!framePending) {
+            framePending = true;
+            requestAnimationFrame(frame);
+        }
+    }).observe(document.documentElement, {childList: true, subtree: true, attributes: true, attributeOldValue: true, characterData: true});
+
+    window.overlayDispatcher.register('tracer', TRACED, function(input) {
+        arrived.push(performance.now());
+    });
+
+    window.overlayTracer = {
+        // [arrival, ms to mutation, ms to frame] for each traced event
+        // since the last drain
+        drain: function() {
+            var drained = samples;
+            samples = [];
+            return drained;
+        }
+    };
+})();
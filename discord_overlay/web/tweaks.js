@@ -0,0 +1,82 @@
+// Overlay tweaks, configured from the settings of the overlay. This runs
+// when the document is created, before streamkit's own scripts, and
+// configuring it again on a live page only changes what differs. The room
+// title and whether we are in the room are decided on the Python side and
+// pushed in through roomState().
+(function() {
+    if (typeof window.overlayTweaks !== 'undefined') {
+        return;
+    }
+
+    function setCSS(id, css) {
+        var style = document.getElementById(id);
+        if (style == null) {
+            style = document.createElement('style');
+            style.type = 'text/css';
+            style.id = id;
+            (document.head || document.documentElement).appendChild(style);
+        }
+        if (style.textContent !== css) {
+            style.textContent = css;
+        }
+    }
+
+    function delCSS(id) {
+        var style = document.getElementById(id);
+        if (style != null) {
+            style.parentNode.removeChild(style);
+        }
+    }
+
+    var match = location.pathname.match(/\/overlay\/\w+\/\d+\/(\d+)/);
+    var room = match ? match[1] : '';
+
+    window.overlayTweaks = {
+        options: {},
+
+        roomState: function(channel, title, active) {
+            if (channel !== room) {
+                return;
+            }
+            document.documentElement.classList.toggle('dol-active', active);
+            if (window.overlayTweaks.options.title && title) {
+                setCSS('title-css', '.voice-container:before{content:' + JSON.stringify(title) +
+                    ';background:rgba(30, 33, 36, 0.95);padding:4px 6px;border-radius: 3px;}');
+            }
+        },
+
+        configure: function(options) {
+            var dispatcher = window.overlayDispatcher;
+            window.overlayTweaks.options = options;
+            setCSS('overlay-tweaks', 'html.dol-hideinactive:not(.dol-active) #app-mount { display: none; }' + options.css);
+            if (!options.title) {
+                delCSS('title-css');
+            }
+            document.documentElement.classList.toggle('dol-hideinactive', options.hideinactive);
+            if (window.overlayChat) {
+                // Picks up a changed message limit
+                window.overlayChat.configure();
+            }
+            if (window.overlayTheme) {
+                window.overlayTheme.apply(options.theme || {});
+            }
+            if (window.overlayFrames) {
+                // Picks up a changed quiet period
+                window.overlayFrames.wake();
+            }
+            if (!options.mutedeaf) {
+                dispatcher.unregister('mutedeaf');
+                if (window.voiceIndex) {
+                    // Otherwise stale states come back when it is turned on
+                    window.voiceIndex.clear();
+                }
+            }
+            // First frame painted with the tweaks in place, in ms since load start
+            if (typeof window.overlayStyledAt === 'undefined') {
+                requestAnimationFrame(function() {
+                    window.overlayStyledAt = performance.now();
+                });
+            }
+        }
+    };
+})();
@@ -13,6 +13,9 @@ setup(
     url = 'https://github.com/trigg/DiscordOverlayLinux',
     packages = find_packages(),
     include_package_data = True,
+    package_data = {
+        'discord_overlay': ['web/*'],
+    },
     data_files = [
         ('share/applications', ['discord-overlay.desktop']),
         ('share/icons', ['discord-overlay.png']),
@@ -26,6 +29,7 @@ setup(
     entry_points = {
         'console_scripts': [
             'discord-overlay = discord_overlay.discord_overlay:entrypoint',
+            'discord-overlay-replay = discord_overlay.replay:main',
         ]
     },
     classifiers = {